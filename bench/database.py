@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bench import synthetic
+from htbpanel.database import Database
+
+ROUNDS = 20
+
+
+def filters(**kwargs):
+    data = {
+        "status": "Both",
+        "availability": [],
+        "difficulty": [],
+        "os": [],
+        "category": [],
+        "area": [],
+        "vulnerability": [],
+    }
+    data.update(kwargs)
+    return data
+
+
+# Filter combinations users actually pick in FilterScreen
+FILTERS = {
+    "none": filters(),
+    "incomplete": filters(status="Incomplete"),
+    "free-easy": filters(availability=["Free"], difficulty=["Easy"]),
+    "complete-linux-hard": filters(
+        status="Complete", difficulty=["Hard", "Insane"], os=["Linux"]
+    ),
+    "category": filters(category=["Category 1", "Category 2"]),
+    "incomplete-windows-tags": filters(
+        status="Incomplete",
+        os=["Windows"],
+        area=["Area 20"],
+        vulnerability=["Vulnerabilities 60", "Vulnerabilities 61"],
+    ),
+}
+
+
+def populate(db, catalog):
+    servers = {v["id"]: v for v in catalog["vpns"]}
+    db.vpn_add({"options": {"EU": {"VIP": {"servers": servers}}}})
+    db.set_user(1)
+    db.machine_add(catalog)
+    tags = [(t["id"], t["category"], t["name"]) for t in catalog["tags"]]
+    relations = [
+        (m_id, tag["id"])
+        for m_id, m_tags in catalog["relations"].items()
+        for tag in m_tags
+    ]
+    # Leave some machines untagged so machines_by_notag has work to do
+    db.tag_bulk_add((tags, relations[: len(relations) * 9 // 10]))
+
+
+def queries(db, catalog):
+    name = catalog["retired"][len(catalog["retired"]) // 2]["name"]
+    yield "machines_with_tags", db.machines_with_tags
+    yield "machines_by_notag", db.machines_by_notag
+    yield "machines_by_name[exact]", lambda: db.machines_by_name(name)
+    yield "machines_by_name[partial]", lambda: db.machines_by_name("ba")
+    yield "machines_by_prefix", lambda: db.machines_by_prefix("ko", True)
+    yield "stats[category]", lambda: db.stats("category")
+    for key, data in FILTERS.items():
+        yield f"machines_by_filters[{key}]", lambda d=data: (
+            db.machines_by_filters(d)
+        )
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, round(pct / 100 * len(ordered)) - 1)]
+
+
+def measure(func, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        rows = func()
+        timings.append(time.perf_counter() - start)
+    # Allocation tracing slows every call down, keep it out of the timings
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": len(rows),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run(scale, rounds):
+    catalog = synthetic.catalog(scale)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "htb.db"))
+        start = time.perf_counter()
+        populate(db, catalog)
+        results["populate"] = {
+            "wall_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+        for name, func in queries(db, catalog):
+            results[name] = measure(func, rounds)
+        db.conn.close()
+    return results
+
+
+def regressions(report, baseline, tolerance):
+    for scale, results in report["scales"].items():
+        for name, res in results.items():
+            base = baseline["scales"].get(str(scale), {}).get(name)
+            if base and "p95_ms" in res:
+                if res["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                    yield scale, name, base["p95_ms"], res["p95_ms"]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.database")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument(
+        "-o", "--output", default="bench_database.json", help="JSON results"
+    )
+    parser.add_argument(
+        "--baseline", help="Fail on p95 regressions against a previous run"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed p95 slowdown against the baseline (default: 0.25)",
+    )
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        # Read it before the results can overwrite it
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = {"rounds": args.rounds, "scales": {}}
+    for scale in args.scales:
+        results = report["scales"][scale] = run(scale, args.rounds)
+        print(f"scale {scale}x ({synthetic.MACHINES * scale} machines)")
+        for name, res in results.items():
+            if "p50_ms" not in res:
+                continue
+            print(
+                f"  {name:<45} {res['rows']:>7} rows "
+                f"p50 {res['p50_ms']:>9.2f} ms  p95 {res['p95_ms']:>9.2f} ms "
+                f"max {res['max_ms']:>9.2f} ms  peak {res['peak_kib']:>9} KiB"
+            )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        slower = list(regressions(report, baseline, args.tolerance))
+        for scale, name, before, after in slower:
+            print(f"Regression {scale}x {name}: p95 {before} -> {after} ms")
+        if slower:
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
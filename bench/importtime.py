@@ -0,0 +1,53 @@
+import argparse
+import subprocess
+import sys
+
+# Modules each entry path needs, and their cumulative import budget in ms
+PATHS = {
+    "startup": (["htbpanel.__main__"], 100),
+    "sync": (
+        ["htbpanel.__main__", "httpx", "htbpanel.metrics", "tqdm"],
+        400,
+    ),
+    "tui": (["htbpanel.__main__", "httpx", "htbpanel.tui"], 1500),
+}
+
+
+def importtime(modules):
+    code = f"import {', '.join(modules)}"
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        # Only top level entries, nested imports are part of their parent
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            total += int(cumulative)
+    return total / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.importtime")
+    parser.add_argument("paths", nargs="*", default=list(PATHS))
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    over = False
+    for path in args.paths:
+        modules, budget = PATHS[path]
+        best = min(importtime(modules) for _ in range(args.rounds))
+        status = "ok" if best <= budget else "OVER BUDGET"
+        over |= best > budget
+        print(f"{path:<8} {best:>8.1f} ms (budget {budget} ms) {status}")
+    if over:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
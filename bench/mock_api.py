@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+from bench import synthetic
+
+PER_PAGE = 100
+
+
+class MockAPI:
+    def __init__(
+        self, scale=1, latency=0, rate_429=0, rate_5xx=0, seed=0, spawn=0
+    ):
+        self.catalog = synthetic.catalog(scale, seed)
+        self.by_id = {
+            m["id"]: m
+            for m in self.catalog["active"] + self.catalog["retired"]
+        }
+        self.by_name = {m["name"]: m for m in self.by_id.values()}
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rng = random.Random(seed)
+        self.current = None
+        self.spawn = spawn
+        self.spawned_at = 0
+        self.vpn = self.catalog["vpns"][0]
+        self.requests = Counter()
+        self.app = web.Application(middlewares=[self.inject])
+        self.app.add_routes(
+            [
+                web.get("/api/v4/user/info", self.user_info),
+                web.get("/api/v4/machine/paginated", self.active),
+                web.get(
+                    "/api/v4/machine/list/retired/paginated", self.retired
+                ),
+                web.get("/api/v4/machine/tags/{id}", self.tags),
+                web.get("/api/v4/machine/profile/{name}", self.profile),
+                web.get("/api/v4/machine/active", self.machine_active),
+                web.get("/api/v4/connections/servers", self.servers),
+                web.get("/api/v4/connection/status", self.status),
+                web.post(
+                    "/api/v4/connections/servers/switch/{id}", self.switch
+                ),
+                web.get("/api/v4/access/ovpnfile/{id}/0", self.ovpn),
+                web.post("/api/v4/vm/{action}", self.vm),
+                web.post("/api/v4/machine/own", self.own),
+            ]
+        )
+
+    @web.middleware
+    async def inject(self, request, handler):
+        if self.latency:
+            await asyncio.sleep(self.rng.expovariate(1 / self.latency))
+        roll = self.rng.random()
+        if roll < self.rate_429:
+            status = 429
+            response = web.json_response(
+                {"message": "Too Many Attempts."},
+                status=429,
+                headers={"Retry-After": "0"},
+            )
+        elif roll < self.rate_429 + self.rate_5xx:
+            status = 503
+            response = web.json_response(
+                {"message": "Unavailable"}, status=503
+            )
+        else:
+            response = await handler(request)
+            status = response.status
+        self.requests[status] += 1
+        return response
+
+    async def user_info(self, request):
+        return web.json_response(
+            {"info": {"id": 1, "name": "mock", "canAccessVIP": True}}
+        )
+
+    async def active(self, request):
+        return web.json_response({"data": self.catalog["active"]})
+
+    async def retired(self, request):
+        machines = self.catalog["retired"]
+        if request.query.get("free"):
+            machines = [m for m in machines if m["free"]]
+        page = int(request.query.get("page", 1))
+        per_page = int(request.query.get("per_page", PER_PAGE))
+        return web.json_response(
+            {
+                "data": machines[(page - 1) * per_page : page * per_page],
+                "meta": {"last_page": max(1, -(-len(machines) // per_page))},
+            }
+        )
+
+    async def tags(self, request):
+        machine_id = int(request.match_info["id"])
+        relations = self.catalog["relations"].get(machine_id, [])
+        return web.json_response({"info": relations})
+
+    def spawning(self):
+        return time.monotonic() - self.spawned_at < self.spawn
+
+    def box_info(self, machine):
+        return {
+            **machine,
+            "ip": f"10.10.{machine['id'] // 256 % 256}.{machine['id'] % 256}"
+            if self.current == machine["id"] and not self.spawning()
+            else None,
+        }
+
+    async def profile(self, request):
+        machine = self.by_name.get(request.match_info["name"])
+        if machine is None:
+            return web.json_response({"message": "Not found"}, status=404)
+        return web.json_response({"info": self.box_info(machine)})
+
+    async def machine_active(self, request):
+        if self.current is None:
+            return web.json_response({"info": None})
+        machine = self.by_id[self.current]
+        return web.json_response(
+            {
+                "info": {
+                    "id": machine["id"],
+                    "name": machine["name"],
+                    "isSpawning": self.spawning(),
+                }
+            }
+        )
+
+    async def servers(self, request):
+        options = {
+            "EU": {
+                "EU - VIP": {
+                    "servers": {str(v["id"]): v for v in self.catalog["vpns"]}
+                }
+            }
+        }
+        return web.json_response(
+            {"data": {"options": options, "assigned": self.vpn}}
+        )
+
+    async def status(self, request):
+        return web.json_response([])
+
+    async def switch(self, request):
+        vpn_id = int(request.match_info["id"])
+        self.vpn = next(v for v in self.catalog["vpns"] if v["id"] == vpn_id)
+        return web.json_response({"status": True})
+
+    async def ovpn(self, request):
+        return web.Response(
+            body=f"remote {self.vpn['hostname']} 1337\n".encode() * 200
+        )
+
+    async def vm(self, request):
+        data = await request.json()
+        action = request.match_info["action"]
+        if action == "spawn":
+            self.current = data["machine_id"]
+            self.spawned_at = time.monotonic()
+        elif action == "terminate":
+            self.current = None
+        return web.json_response({"message": f"Machine {action} requested"})
+
+    async def own(self, request):
+        data = await request.json()
+        if data["flag"] != "0" * 32:
+            return web.json_response(
+                {"message": "Incorrect flag!"}, status=400
+            )
+        return web.json_response({"message": "Owned!", "own_type": "user"})
+
+
+async def serve(mock, host="127.0.0.1", port=0):
+    runner = web.AppRunner(mock.app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://{host}:{port}/api/v4"
+
+
+async def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.mock_api")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--rate-429", type=float, default=0)
+    parser.add_argument("--rate-5xx", type=float, default=0)
+    parser.add_argument(
+        "--spawn", type=float, default=0, help="Seconds until a box is up"
+    )
+    args = parser.parse_args()
+    mock = MockAPI(
+        args.scale,
+        args.latency,
+        args.rate_429,
+        args.rate_5xx,
+        spawn=args.spawn,
+    )
+    _, url = await serve(mock, port=args.port)
+    print(f"Serving mock HTB API, use HTB_API={url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+import htbpanel.htbapi as api
+from bench.mock_api import MockAPI, serve
+from htbpanel.database import Database
+
+
+async def phase(name, statuses, coro):
+    statuses.clear()
+    start = time.perf_counter()
+    await coro
+    wall = time.perf_counter() - start
+    requests = sum(statuses.values())
+    return {
+        "phase": name,
+        "requests": requests,
+        "statuses": dict(statuses),
+        "wall": round(wall, 3),
+        "rps": round(requests / wall, 1) if wall else None,
+    }
+
+
+async def update_retired(client, db):
+    db.machine_add(await api.query_boxes(client))
+
+
+async def update_tags(client, db):
+    db.tag_bulk_add(await api.query_tags(client, db.machines_by_notag()))
+
+
+async def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.sync")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rate-429", type=float, default=0)
+    parser.add_argument("--rate-5xx", type=float, default=0)
+    parser.add_argument(
+        "--sleep",
+        type=float,
+        default=0,
+        help="Pause between paginated requests (htbapi default: 2.5)",
+    )
+    parser.add_argument("-o", "--output", help="Store results as JSON")
+    args = parser.parse_args()
+
+    mock = MockAPI(args.scale, args.latency, args.rate_429, args.rate_5xx)
+    runner, url = await serve(mock)
+    api.API = url
+    api.SLEEP = args.sleep
+    statuses = Counter()
+
+    async def count(response):
+        statuses[response.status_code] += 1
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "htb.db"))
+        async with httpx.AsyncClient(
+            event_hooks={"response": [count]}, timeout=30
+        ) as client:
+            results.append(
+                await phase(
+                    "update-retired", statuses, update_retired(client, db)
+                )
+            )
+            results.append(
+                await phase("update-tags", statuses, update_tags(client, db))
+            )
+        db.conn.close()
+    await runner.cleanup()
+
+    for res in results:
+        print(
+            f"{res['phase']:<16} {res['requests']:>6} requests "
+            f"{res['wall']:>8.2f} s {res['rps']:>8} req/s "
+            f"statuses={res['statuses']}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import random
+
+# Roughly the size of the HTB catalog at the time of writing
+MACHINES = 500
+ACTIVE = 20
+TAGS = {"Category": 12, "Area of Interest": 40, "Vulnerabilities": 90}
+TAGS_PER_MACHINE = 6
+VPNS = 24
+
+DIFFICULTIES = ["Easy", "Medium", "Hard", "Insane"]
+OSES = ["Linux", "Windows", "FreeBSD", "OpenBSD", "Other"]
+SYLLABLES = ["ba", "ko", "ri", "te", "lu", "xa", "mo", "ne", "si", "dor"]
+
+
+def name(rng, idx):
+    word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+    return f"{word.capitalize()}{idx}"
+
+
+def catalog(scale=1, seed=0):
+    rng = random.Random(seed)
+    tags = []
+    for category, count in TAGS.items():
+        for _ in range(count * scale):
+            tags.append(
+                {
+                    "id": len(tags) + 1,
+                    "category": category,
+                    "name": f"{category.split()[0]} {len(tags) + 1}",
+                }
+            )
+    machines = []
+    relations = {}
+    for idx in range(1, MACHINES * scale + 1):
+        machines.append(
+            {
+                "id": idx,
+                "name": name(rng, idx),
+                "difficultyText": rng.choice(DIFFICULTIES),
+                "os": rng.choice(OSES),
+                "free": rng.random() < 0.05,
+                "authUserInUserOwns": rng.random() < 0.3,
+                "authUserInRootOwns": rng.random() < 0.2,
+                "stars": round(rng.uniform(2.5, 5), 1),
+                "release": f"20{rng.randint(17, 25)}-01-01T19:00:00.000000Z",
+            }
+        )
+        relations[idx] = rng.sample(tags, TAGS_PER_MACHINE)
+    vpns = [
+        {
+            "id": idx,
+            "friendly_name": f"{rng.choice(['EU', 'US', 'SG', 'AU'])} "
+            f"VIP {idx}",
+            "hostname": f"edge-{idx}.hackthebox.eu",
+        }
+        for idx in range(1, VPNS + 1)
+    ]
+    return {
+        "active": machines[-ACTIVE * scale :],
+        "retired": machines[: -ACTIVE * scale],
+        "tags": tags,
+        "relations": relations,
+        "vpns": vpns,
+    }
@@ -1,13 +1,15 @@
 import argparse
 import asyncio
+import hashlib
 import os
 
-import httpx
-
+import htbpanel.cli as cli
 import htbpanel.htbapi as api
-import htbpanel.tui as tui
 from htbpanel.database import Database
 
+# Heavy modules (httpx, textual, tqdm) are imported only on the paths using
+# them, so sync-only invocations do not pay for the TUI at startup
+
 
 def headers(token):
     return {
@@ -16,7 +18,7 @@ def headers(token):
     }
 
 
-async def main():
+def main():
     parser = argparse.ArgumentParser(prog="python -m htbpanel")
     parser.add_argument(
         "-ut", "--update-tags", action="store_true", help="Update missing tags"
@@ -39,39 +41,210 @@ async def main():
         action="store_true",
         help="Update missing vpns",
     )
+    parser.add_argument(
+        "-n",
+        "--no-ui",
+        action="store_true",
+        help="Only run the requested updates, do not launch the TUI",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Trace event loop stalls and hot paths into htbpanel_trace.txt",
+    )
+    parser.add_argument(
+        "--trace-threshold",
+        type=float,
+        default=100,
+        help="Event loop stall threshold in milliseconds (default: 100)",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="Store API metrics on exit (.prom for Prometheus, else JSON)",
+    )
+    parser.add_argument(
+        "-A",
+        "--account",
+        type=int,
+        default=0,
+        help="Index of the token to use for the TUI and commands (default: 0)",
+    )
+    parser.add_argument(
+        "-a",
+        "--attach",
+        action="store_true",
+        help="Use a running daemon instead of a private client and database",
+    )
+    parser.add_argument(
+        "-s",
+        "--socket",
+        default="htbpanel.sock",
+        help="Unix socket of the daemon (default: htbpanel.sock)",
+    )
+    commands = parser.add_subparsers(
+        dest="command",
+        metavar="COMMAND",
+        help="Run headlessly, printing one JSON document per line",
+    )
+    cli.add_commands(commands)
+    cmd = commands.add_parser(
+        "daemon", help="Share one API client and database over a Unix socket"
+    )
+    # SUPPRESS keeps the top level --socket unless one follows the command
+    cmd.add_argument("-s", "--socket", default=argparse.SUPPRESS)
+    cmd = commands.add_parser(
+        "serve", help="Serve the TUI to browsers, one session per tab"
+    )
+    cmd.add_argument("-s", "--socket", default=argparse.SUPPRESS)
+    cmd.add_argument("--host", default="localhost")
+    cmd.add_argument("--port", type=int, default=8000)
     args = parser.parse_args()
 
-    client = httpx.AsyncClient(headers=headers(TOKEN), timeout=30)
-    db = Database()
+    if args.command == "serve":
+        import htbpanel.serve as serve
 
-    if args.update_vpns or not db.vpn_count():
-        db.vpn_add(await api.query_vpn_servers(client))
+        serve.serve(args)
+    elif args.command == "snapshot":
+        if not cli.snapshot(args, Database()):
+            exit(1)
+    else:
+        asyncio.run(start(args))
 
-    if args.update_retired or not db.machine_count():
-        db.machine_add(await api.query_boxes(client))
 
+async def start(args):
+    if args.trace:
+        import htbpanel.trace as trace
+
+        tracer = trace.enable(args.trace_threshold / 1000)
+        tracer.start()
+        try:
+            await run(args)
+        finally:
+            tracer.stop()
+            print(f"Trace report stored in {tracer.report()}")
+    else:
+        await run(args)
+
+
+# Several accounts can be given separated by commas, spaces or newlines
+def load_tokens():
+    tokens = os.environ.get("HTB_KEY")
+    if tokens is None:
+        try:
+            with open(".api") as f:
+                tokens = f.read()
+        except FileNotFoundError:
+            print("Error: HTB_KEY unset or .api file missing")
+            exit(1)
+    return tokens.replace(",", " ").split()
+
+
+# Map each token to its user once, later runs need no /user/info call
+async def load_account(client, db, token):
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    user_id = db.account(token_hash)
+    if user_id is not None:
+        return user_id, False
     info = await api.query_user_info(client)
-    info.update(await api.query_current_box(client))
-    info.update(await api.query_current_vpn(client))
+    db.account_add(token_hash, info["user"]["id"], info["user"]["name"])
+    return info["user"]["id"], True
+
+
+async def run(args):
+    if args.attach:
+        import htbpanel.daemon as daemon
+
+        if not daemon.listening(args.socket):
+            print(f"Error: no daemon listening on {args.socket}")
+            exit(1)
+        client, db = daemon.connect(args.socket)
+        accounts = [(client, None, False)]
+    else:
+        import httpx
+
+        from htbpanel.metrics import Metrics, MetricsTransport
+
+        tokens = load_tokens()
+        if not 0 <= args.account < len(tokens):
+            print(f"Error: account {args.account} out of {len(tokens)} tokens")
+            exit(1)
+        metrics = Metrics()
+        clients = []
+        for token in tokens:
+            clients.append(
+                httpx.AsyncClient(
+                    headers=headers(token),
+                    timeout=30,
+                    transport=MetricsTransport(metrics),
+                )
+            )
+            clients[-1].metrics = metrics
+        client = clients[args.account]
+        db = Database()
+        users = await asyncio.gather(
+            *[load_account(c, db, t) for c, t in zip(clients, tokens)]
+        )
+        accounts = [(c, *user) for c, user in zip(clients, users)]
+        # Single-token installs kept owns in machines, they belong to the
+        # first token whichever account is picked now
+        db.owns_migrate(users[0][0])
+        db.set_user(users[args.account][0])
+    try:
+        await sync_and_run(args, client, db, accounts)
+    finally:
+        if args.metrics:
+            print(f"API metrics stored in {client.metrics.dump(args.metrics)}")
+
+
+async def sync_and_run(args, client, db, accounts):
+    # Servers stored before latency probing have no hostname to probe, refetch
+    # them once. Servers the API lists without one stay unprobed.
+    if args.update_vpns or not db.meta_get("vpn_hostnames"):
+        db.vpn_add(await api.query_vpn_servers(client))
+        db.meta_set("vpn_hostnames", 1)
+
+    # The catalog is shared, but owns come with each account's listing
+    empty = not db.machine_count()
+    sync = [
+        (c, user_id)
+        for c, user_id, new in accounts
+        if args.update_retired or empty or new
+    ]
+    boxes = await asyncio.gather(*[api.query_boxes(c) for c, _ in sync])
+    for (_, user_id), data in zip(sync, boxes):
+        db.machine_add(data, user_id)
 
     if args.update_machines:
         await api.query_new_boxes(client, db)
 
     if args.update_tags:
         missing = db.machines_by_notag()
-        db.add_tags_info(await api.query_tags(client, missing))
+        db.tag_bulk_add(await api.query_tags(client, missing))
+
+    if args.command == "daemon":
+        import htbpanel.daemon as daemon
+
+        await daemon.serve(client, db, args.socket)
+        return
+
+    if args.command:
+        if not await cli.run(args, client, db):
+            exit(1)
+        return
+
+    if args.no_ui:
+        return
+
+    import htbpanel.tui as tui
+
+    info = await api.query_user_info(client)
+    info.update(await api.query_current_box(client))
+    info.update(await api.query_current_vpn(client))
 
     app = tui.HTBPanel(client, db, info)
     await app.run_async()
 
 
 if __name__ == "__main__":
-    TOKEN = os.environ.get("HTB_KEY")
-    if TOKEN is None:
-        try:
-            with open(".api") as f:
-                TOKEN = f.read().strip()
-        except FileNotFoundError:
-            print("Error: HTB_KEY unset or .api file missing")
-            exit(1)
-    asyncio.run(main())
+    main()
@@ -0,0 +1,240 @@
+import json
+import sys
+
+import htbpanel.htbapi as api
+import htbpanel.ready as ready
+
+
+def emit(data):
+    print(json.dumps(data), flush=True)
+
+
+def items(values):
+    if values == ["-"]:
+        return [line.strip() for line in sys.stdin if line.strip()]
+    return values
+
+
+# Database rows are formatted for the TUI, turn the icons back into booleans
+def machine_json(row):
+    name, difficulty, os, free, own, tags = row
+    user_own, root_own = own.split("/")
+    return {
+        "name": name,
+        "difficulty": difficulty,
+        "os": os,
+        "free": free == "✓",
+        "user_own": user_own == "✓",
+        "root_own": root_own == "✓",
+        "tags": tags.split(",") if tags else [],
+    }
+
+
+def resolve(db, machine):
+    if machine.isdigit():
+        return int(machine)
+    return db.machine_id_by_name(machine)
+
+
+def add_commands(subparsers):
+    subparsers.add_parser("status", help="Show user, active box and VPN")
+    for action in ["start", "stop", "reset"]:
+        cmd = subparsers.add_parser(action, help=f"{action.capitalize()} boxes")
+        cmd.add_argument(
+            "machines", nargs="+", help="Names or ids, - for stdin"
+        )
+    cmd = subparsers.add_parser("flag", help="Submit flags")
+    cmd.add_argument(
+        "flags",
+        nargs="+",
+        help="Flags or MACHINE:FLAG pairs, - for one per line on stdin",
+    )
+    cmd.add_argument(
+        "-m", "--machine", help="Target machine (default: active box)"
+    )
+    cmd = subparsers.add_parser("wait", help="Wait for the active box IP")
+    cmd.add_argument("-t", "--timeout", type=float, default=ready.TIMEOUT)
+    cmd = subparsers.add_parser("vpn", help="List VPNs or switch to one")
+    cmd.add_argument("vpn", nargs="?", type=int, help="VPN id to switch to")
+    cmd.add_argument(
+        "-p",
+        "--probe",
+        action="store_true",
+        help="Measure the latency to every server before listing them",
+    )
+    cmd.add_argument(
+        "--port", type=int, default=443, help="TCP port to probe (default: 443)"
+    )
+    cmd = subparsers.add_parser("search", help="Search machines by name")
+    cmd.add_argument("name")
+    cmd = subparsers.add_parser("filter", help="Filter machines")
+    cmd.add_argument(
+        "--status", choices=["Complete", "Incomplete", "Both"], default="Both"
+    )
+    cmd.add_argument(
+        "--availability", nargs="+", choices=["Free", "Active"], default=[]
+    )
+    for name in ["difficulty", "os", "category", "area", "vulnerability"]:
+        cmd.add_argument(f"--{name}", nargs="+", default=[])
+    subparsers.add_parser(
+        "stats", help="Show owns by difficulty, OS and tag category"
+    )
+    cmd = subparsers.add_parser(
+        "snapshot", help="Export or import the machine catalog, no API needed"
+    )
+    cmd.add_argument("action", choices=["export", "import"])
+    cmd.add_argument("file")
+    cmd.add_argument(
+        "-b", "--base", help="Only export changes since this older snapshot"
+    )
+
+
+async def run(args, client, db):
+    match args.command:
+        case "status":
+            info = await api.query_user_info(client)
+            info.update(await api.query_current_box(client))
+            info.update(await api.query_current_vpn(client))
+            emit(info)
+        case "start" | "stop" | "reset":
+            return await machine_actions(args, client, db)
+        case "flag":
+            return await submit_flags(args, client, db)
+        case "wait":
+            return await wait_ip(args, client, db)
+        case "vpn":
+            return await vpn(args, client, db)
+        case "search":
+            for row in db.machines_by_name(args.name):
+                emit(machine_json(row))
+        case "stats":
+            for dimension in ["difficulty", "os", "category"]:
+                for key, user_own, root_own, total in db.stats(dimension):
+                    emit(
+                        {
+                            "dimension": dimension,
+                            "key": key,
+                            "user_own": user_own,
+                            "root_own": root_own,
+                            "total": total,
+                        }
+                    )
+        case "filter":
+            filters = {
+                "status": args.status,
+                "availability": args.availability,
+                "difficulty": args.difficulty,
+                "os": args.os,
+                "category": args.category,
+                "area": args.area,
+                "vulnerability": args.vulnerability,
+            }
+            for row in db.machines_by_filters(filters):
+                emit(machine_json(row))
+    return True
+
+
+# Runs before any token or API client is needed
+def snapshot(args, db):
+    import htbpanel.snapshot as snap
+
+    try:
+        if args.action == "export":
+            rows = snap.export(db, args.file, args.base)
+        else:
+            rows = snap.apply(db, args.file)
+    except (OSError, ValueError, snap.SnapshotError) as e:
+        emit({"file": args.file, "ok": False, "message": str(e)})
+        return False
+    emit({"file": args.file, "ok": True, "action": args.action, "rows": rows})
+    return True
+
+
+async def machine_actions(args, client, db):
+    success = True
+    for machine in items(args.machines):
+        machine_id = resolve(db, machine)
+        if machine_id is None:
+            ok, message = False, "Unknown machine"
+        else:
+            ok, message = await api.machine_action(
+                client, args.command, machine_id
+            )
+        success &= ok
+        emit(
+            {
+                "machine": machine,
+                "id": machine_id,
+                "action": args.command,
+                "ok": ok,
+                "message": message,
+            }
+        )
+    return success
+
+
+async def submit_flags(args, client, db):
+    machine = args.machine
+    if machine is None:
+        box = (await api.query_current_box(client))["current_box"]
+        machine = str(box["id"]) if box else None
+    success = True
+    for flag in items(args.flags):
+        target = machine
+        if ":" in flag:
+            target, flag = flag.rsplit(":", 1)
+        machine_id = resolve(db, target) if target else None
+        if machine_id is None:
+            out = {"ok": False, "message": "Unknown machine"}
+        else:
+            data = await api.submit_flag(client, machine_id, flag)
+            ok = "Incorrect" not in data["message"]
+            out = {"ok": ok, "message": data["message"]}
+            if ok and "own_type" in data:
+                out["own_type"] = data["own_type"].lower()
+                db.machine_own(machine_id, out["own_type"])
+        success &= out["ok"]
+        emit({"machine": target, "id": machine_id, "flag": flag, **out})
+    return success
+
+
+async def wait_ip(args, client, db):
+    vpn = (await api.query_current_vpn(client))["current_vpn"]
+    box = await ready.wait_ready(client, args.timeout, db, vpn.get("id"))
+    emit({"current_box": box})
+    return box is not None and bool(box["ip"])
+
+
+async def vpn(args, client, db):
+    if args.vpn is None:
+        if args.probe:
+            import htbpanel.probe as probe
+
+            # Stdout stays one document per server
+            if not db.vpn_endpoints():
+                print(probe.NO_HOSTNAMES, file=sys.stderr)
+            await probe.update(db, args.port)
+        spawns = {row[0]: row[1:] for row in db.spawn_stats()}
+        for name, vpn_id, latency in db.vpn_list():
+            count, mean, longest = spawns.get(vpn_id, (0, None, None))
+            emit(
+                {
+                    "id": vpn_id,
+                    "name": name,
+                    "latency_ms": (
+                        None if latency is None else round(latency * 1000, 1)
+                    ),
+                    "spawns": count,
+                    "spawn_mean_s": None if mean is None else round(mean, 1),
+                    "spawn_max_s": (
+                        None if longest is None else round(longest, 1)
+                    ),
+                }
+            )
+        return True
+    info = await api.query_user_info(client)
+    info.update(await api.query_current_vpn(client))
+    switched = await api.switch_vpn(client, info, args.vpn)
+    filename = await api.download_vpn(client, db, info, args.vpn)
+    emit({"id": args.vpn, "switched": switched, "file": filename})
+    return filename is not None
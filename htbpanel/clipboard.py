@@ -0,0 +1,33 @@
+import asyncio
+import os
+import shutil
+from functools import cache
+
+BACKENDS = [
+    ("WAYLAND_DISPLAY", ["wl-copy"]),
+    ("DISPLAY", ["xclip", "-selection", "clipboard"]),
+    ("DISPLAY", ["xsel", "--clipboard", "--input"]),
+]
+
+
+@cache
+def backend():
+    for env, command in BACKENDS:
+        if os.environ.get(env) and shutil.which(command[0]):
+            return command
+    return None
+
+
+# Without a local backend (e.g. over SSH) fall back to the OSC 52 escape
+async def copy(text, osc52):
+    command = backend()
+    if command is None:
+        osc52(text)
+        return
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    await proc.communicate(text.encode())
@@ -0,0 +1,379 @@
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import msgpack
+
+import htbpanel.htbapi as api
+from htbpanel.database import Database
+from htbpanel.metrics import write_atomic
+
+SOCKET = "htbpanel.sock"
+TTL = 5
+RATE = 4
+READERS = 4
+CATALOG = 1024
+# Read-only Database methods, answered from the catalog cache or the pool
+READS = {
+    "account",
+    "meta_get",
+    "catalog_dump",
+    "machines_with_tags",
+    "machine_count",
+    "machine_by_id",
+    "machine_id_by_name",
+    "machines_os_list",
+    "machines_by_active",
+    "machines_by_prefix",
+    "machines_by_filters",
+    "machines_by_notag",
+    "machines_by_name",
+    "vpn_list",
+    "vpn_count",
+    "vpn_file",
+    "vpn_endpoints",
+    "vpn_probed_at",
+    "spawn_stats",
+    "stats",
+    "tags_category_list",
+    "tags_area_list",
+    "tags_vulnerability_list",
+    "_machine_parse",
+}
+# Writes attached sessions make, account and schema methods stay local
+WRITES = {
+    "machine_add",
+    "machine_own",
+    "machines_reset_free_active",
+    "machines_update_active",
+    "machines_update_free",
+    "tag_bulk_add",
+    "meta_set",
+    "vpn_add",
+    "vpn_latency_add",
+    "vpn_file_add",
+    "spawn_time_add",
+}
+
+
+class DaemonError(RuntimeError):
+    pass
+
+
+def pack(data):
+    return msgpack.packb(data, default=list, use_bin_type=True)
+
+
+def unpacker():
+    return msgpack.Unpacker(raw=False, strict_map_key=False)
+
+
+# A socket file can outlive a killed daemon, only a connection tells
+def listening(path):
+    with socket.socket(socket.AF_UNIX) as sock:
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+    return True
+
+
+class ReadPool:
+    def __init__(self, owner, size=READERS):
+        self.owner = owner
+        self.executor = ThreadPoolExecutor(size, "htbpanel-read")
+        self.local = threading.local()
+
+    def db(self):
+        if not hasattr(self.local, "db"):
+            self.local.db = Database(self.owner.path, readonly=True)
+        # Owns are read for the daemon's account
+        self.local.db.user_id = self.owner.user_id
+        return self.local.db
+
+    async def call(self, name, params):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, lambda: getattr(self.db(), name)(*params)
+        )
+
+
+class Daemon:
+    def __init__(self, client, db, ttl=TTL, rate=RATE):
+        self.client = client
+        self.db = db
+        self.ttl = ttl
+        self.interval = 1 / rate
+        self.slot = 0
+        self.cache = {}
+        self.catalog = {}
+        self.generation = 0
+        # Readers see the writer's commits without blocking on it
+        db.cursor.execute("PRAGMA journal_mode=WAL").fetchall()
+        self.readers = ReadPool(db)
+
+    async def serve(self, path=SOCKET):
+        if listening(path):
+            raise DaemonError(f"A daemon already listens on {path}")
+        if os.path.exists(path):
+            os.unlink(path)
+        # The daemon acts with our token, keep the socket private
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path)
+        finally:
+            os.umask(umask)
+        print(f"Listening on {path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            os.unlink(path)
+
+    async def handle(self, reader, writer):
+        messages = unpacker()
+        lock = asyncio.Lock()
+        tasks = set()
+        while data := await reader.read(65536):
+            messages.feed(data)
+            for msg in messages:
+                task = asyncio.ensure_future(self.dispatch(msg, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        writer.close()
+
+    async def dispatch(self, msg, writer, lock):
+        out = {"id": msg["id"]}
+        try:
+            out["result"] = await self.call(msg["method"], msg["args"])
+        except Exception as e:
+            out["error"] = f"{type(e).__name__}: {e}"
+        async with lock:
+            writer.write(pack(out))
+            await writer.drain()
+
+    async def call(self, method, args):
+        match method:
+            case "http":
+                return await self.http(*args)
+            case "db":
+                return await self.database(*args)
+            case "metrics":
+                name, params = args
+                if name not in [
+                    "snapshot",
+                    "summary",
+                    "to_json",
+                    "to_prometheus",
+                    "wait",
+                ]:
+                    raise DaemonError(f"Unknown metrics method {name}")
+                return getattr(self.client.metrics, name)(*params)
+        raise DaemonError(f"Unknown method {method}")
+
+    # Sessions share one catalog: reads are cached until the next write
+    async def database(self, name, params):
+        if name not in READS and name not in WRITES:
+            raise DaemonError(f"Unknown database method {name}")
+        if name not in READS:
+            self.generation += 1
+            self.catalog.clear()
+            return getattr(self.db, name)(*params)
+        key = (name, self.db.user_id, pack(params))
+        if key in self.catalog:
+            return self.catalog[key]
+        generation = self.generation
+        result = await api.single_flight(
+            ("db", generation, key), self.readers.call, name, params
+        )
+        # Do not cache answers that raced with a write
+        if generation == self.generation:
+            if len(self.catalog) >= CATALOG:
+                self.catalog.pop(next(iter(self.catalog)))
+            self.catalog[key] = result
+        return result
+
+    async def http(self, method, url, params, payload):
+        if method != "GET":
+            # Actions change the account state, drop every cached answer
+            self.cache.clear()
+            return await self.fetch(method, url, params, payload)
+        key = (url, json.dumps(params, sort_keys=True))
+        hit = self.cache.get(key)
+        if hit is not None and time.monotonic() - hit[0] < self.ttl:
+            return hit[1]
+        res = await api.single_flight(
+            ("http", key), self.fetch, method, url, params, None
+        )
+        if res[0] == 200:
+            self.cache[key] = (time.monotonic(), res)
+        return res
+
+    # Every instance shares one request budget
+    async def fetch(self, method, url, params, payload):
+        now = time.monotonic()
+        self.slot = max(self.slot + self.interval, now)
+        if self.slot > now:
+            await api.wait(self.client, self.slot - now)
+        res = await api.request(
+            self.client, method, url, params=params, json=payload
+        )
+        return [res.status_code, dict(res.headers), res.content]
+
+
+class SyncConnection:
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX)
+        self.sock.connect(path)
+        self.messages = unpacker()
+        self.lock = threading.Lock()
+        self.ids = 0
+
+    def call(self, method, *args):
+        with self.lock:
+            self.ids += 1
+            self.sock.sendall(
+                pack({"id": self.ids, "method": method, "args": args})
+            )
+            while True:
+                for msg in self.messages:
+                    if "error" in msg:
+                        raise DaemonError(msg["error"])
+                    return msg["result"]
+                data = self.sock.recv(65536)
+                if not data:
+                    raise DaemonError("Daemon closed the connection")
+                self.messages.feed(data)
+
+
+class AsyncConnection:
+    def __init__(self, path):
+        self.path = path
+        self.pending = {}
+        self.ids = 0
+        self.writer = None
+
+    async def call(self, method, *args):
+        if self.writer is None:
+            reader, self.writer = await asyncio.open_unix_connection(self.path)
+            self.reader_task = asyncio.ensure_future(self.read(reader))
+        self.ids += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.ids] = future
+        self.writer.write(
+            pack({"id": self.ids, "method": method, "args": args})
+        )
+        await self.writer.drain()
+        return await future
+
+    async def read(self, reader):
+        messages = unpacker()
+        while data := await reader.read(65536):
+            messages.feed(data)
+            for msg in messages:
+                future = self.pending.pop(msg["id"])
+                if "error" in msg:
+                    future.set_exception(DaemonError(msg["error"]))
+                else:
+                    future.set_result(msg["result"])
+        for future in self.pending.values():
+            future.set_exception(DaemonError("Daemon closed the connection"))
+        self.pending.clear()
+        self.writer = None
+
+    async def aclose(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class RemoteResponse:
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = httpx.Headers(headers)
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    async def aiter_bytes(self):
+        yield self.content
+
+
+class RemoteMetrics:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def snapshot(self):
+        return self.conn.call("metrics", "snapshot", [])
+
+    def summary(self):
+        return self.conn.call("metrics", "summary", [])
+
+    def wait(self, seconds):
+        self.conn.call("metrics", "wait", [seconds])
+
+    def dump(self, path):
+        if path.endswith(".prom"):
+            text = self.conn.call("metrics", "to_prometheus", [])
+        else:
+            data = self.conn.call("metrics", "to_json", [])
+            text = json.dumps(data, indent=2)
+        write_atomic(path, text)
+        return path
+
+
+# Thin stand-ins for httpx.AsyncClient and Database talking to the daemon
+class RemoteClient:
+    # The daemon already retries, doing it here too multiplies the requests
+    retries = 0
+
+    def __init__(self, path, conn):
+        self.conn = AsyncConnection(path)
+        self.metrics = RemoteMetrics(conn)
+
+    async def request(self, method, url, params=None, json=None):
+        return RemoteResponse(
+            *await self.conn.call("http", method, str(url), params, json)
+        )
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    # The daemon buffers the body, which is small enough for one message
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        yield await self.request(method, url, **kwargs)
+
+    async def aclose(self):
+        await self.conn.aclose()
+
+
+class RemoteDatabase:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __getattr__(self, name):
+        if name not in READS and name not in WRITES:
+            raise AttributeError(name)
+
+        def method(*args):
+            return self.conn.call("db", name, args)
+
+        return method
+
+
+def connect(path=SOCKET):
+    conn = SyncConnection(path)
+    return RemoteClient(path, conn), RemoteDatabase(conn)
+
+
+async def serve(client, db, path=SOCKET):
+    await Daemon(client, db).serve(path)
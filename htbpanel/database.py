@@ -1,20 +1,198 @@
+import pathlib
 import sqlite3
+import time
 
 DB = "htb.db"
+OWNS = "COALESCE(owns.user_own, 0), COALESCE(owns.root_own, 0)"
+CATALOG = {
+    "vpns": ["id", "name", "hostname"],
+    "machines": ["id", "name", "difficulty", "os", "free", "active"],
+    "tags": ["id", "category", "name"],
+    "machine_tag": ["machine_id", "tag_id"],
+}
+# Leading columns of each catalog table forming its primary key
+CATALOG_KEYS = {"vpns": 1, "machines": 1, "tags": 1, "machine_tag": 2}
+OWNS_JOIN = (
+    "LEFT JOIN owns "
+    "ON owns.machine_id = machines.id AND owns.user_id = ? "
+)
+# Tags of this category are counted in the stats
+STATS_CATEGORY = "Category"
+STATS_TAG = (
+    "(SELECT name FROM tags WHERE id = {}.tag_id "
+    f"AND category = '{STATS_CATEGORY}')"
+)
+
+
+# Add one machine (sign 1) or take it out (sign -1) of a stats key, together
+# with the owns every account has on it
+def _stats_count(dimension, key, machine, sign):
+    return (
+        "INSERT INTO stats (dimension, key, total) "
+        f"VALUES ('{dimension}', {key}, {sign}) "
+        "ON CONFLICT (dimension, key) "
+        "DO UPDATE SET total = total + excluded.total; "
+        "INSERT INTO stats_own "
+        "(user_id, dimension, key, user_own, root_own) "
+        f"SELECT user_id, '{dimension}', {key}, "
+        f"{sign} * COALESCE(user_own, 0), {sign} * COALESCE(root_own, 0) "
+        f"FROM owns WHERE machine_id = {machine} "
+        "ON CONFLICT (user_id, dimension, key) DO UPDATE SET "
+        "user_own = user_own + excluded.user_own, "
+        "root_own = root_own + excluded.root_own;"
+    )
+
+
+# Add the difference between two owns of a machine to all its stats keys
+def _stats_own(row, user_own, root_own):
+    return (
+        "INSERT INTO stats_own "
+        "(user_id, dimension, key, user_own, root_own) "
+        f"SELECT {row}.user_id, dimension, key, {user_own}, {root_own} "
+        f"FROM machine_keys WHERE machine_id = {row}.machine_id "
+        "ON CONFLICT (user_id, dimension, key) DO UPDATE SET "
+        "user_own = user_own + excluded.user_own, "
+        "root_own = root_own + excluded.root_own;"
+    )
+
+
+def _trigger(name, event, body, when=None):
+    when = f"WHEN {when} " if when else ""
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {name} {event} {when}"
+        f"BEGIN {body} END;"
+    )
+
+
+def _stats_machine(row, sign):
+    return _stats_count(
+        "difficulty", f"{row}.difficulty", f"{row}.id", sign
+    ) + _stats_count("os", f"{row}.os", f"{row}.id", sign)
+
+
+def _stats_tag(row, sign):
+    return _stats_count(
+        "category", STATS_TAG.format(row), f"{row}.machine_id", sign
+    )
+
+
+# Move every machine of a tag in or out of its stats key at once
+def _stats_tag_all(row, sign):
+    tagged = (
+        f"FROM machine_tag WHERE tag_id = {row}.id "
+        f"AND {row}.category = '{STATS_CATEGORY}' GROUP BY tag_id "
+    )
+    return (
+        "INSERT INTO stats (dimension, key, total) "
+        f"SELECT 'category', {row}.name, {sign} * COUNT(*) {tagged}"
+        "ON CONFLICT (dimension, key) "
+        "DO UPDATE SET total = total + excluded.total; "
+        "INSERT INTO stats_own "
+        "(user_id, dimension, key, user_own, root_own) "
+        f"SELECT owns.user_id, 'category', {row}.name, "
+        f"{sign} * SUM(COALESCE(owns.user_own, 0)), "
+        f"{sign} * SUM(COALESCE(owns.root_own, 0)) "
+        "FROM machine_tag "
+        "JOIN owns ON owns.machine_id = machine_tag.machine_id "
+        f"WHERE machine_tag.tag_id = {row}.id "
+        f"AND {row}.category = '{STATS_CATEGORY}' GROUP BY owns.user_id "
+        "ON CONFLICT (user_id, dimension, key) DO UPDATE SET "
+        "user_own = user_own + excluded.user_own, "
+        "root_own = root_own + excluded.root_own;"
+    )
+
+
+def _owned(row, column):
+    return f"COALESCE({row}.{column}, 0)"
+
+
+# Every key a machine is counted under, by difficulty, OS and tag category
+STATS_SQL = "\n".join(
+    [
+        "CREATE VIEW IF NOT EXISTS machine_keys AS "
+        "SELECT id AS machine_id, 'difficulty' AS dimension, "
+        "difficulty AS key FROM machines "
+        "UNION ALL SELECT id, 'os', os FROM machines "
+        "UNION ALL SELECT machine_tag.machine_id, 'category', tags.name "
+        "FROM machine_tag JOIN tags ON tags.id = machine_tag.tag_id "
+        f"WHERE tags.category = '{STATS_CATEGORY}';",
+        _trigger(
+            "stats_machine_insert",
+            "AFTER INSERT ON machines",
+            _stats_machine("NEW", 1),
+        ),
+        _trigger(
+            "stats_machine_update",
+            "AFTER UPDATE OF difficulty, os ON machines",
+            _stats_machine("OLD", -1) + _stats_machine("NEW", 1),
+            "OLD.difficulty IS NOT NEW.difficulty OR OLD.os IS NOT NEW.os",
+        ),
+        _trigger(
+            "stats_machine_delete",
+            "AFTER DELETE ON machines",
+            _stats_machine("OLD", -1),
+        ),
+        _trigger(
+            "stats_tag_insert",
+            "AFTER INSERT ON machine_tag",
+            _stats_tag("NEW", 1),
+            f"{STATS_TAG.format('NEW')} IS NOT NULL",
+        ),
+        _trigger(
+            "stats_tag_delete",
+            "AFTER DELETE ON machine_tag",
+            _stats_tag("OLD", -1),
+            f"{STATS_TAG.format('OLD')} IS NOT NULL",
+        ),
+        _trigger(
+            "stats_tag_update",
+            "AFTER UPDATE OF name, category ON tags",
+            _stats_tag_all("OLD", -1) + _stats_tag_all("NEW", 1),
+            "OLD.name IS NOT NEW.name OR OLD.category IS NOT NEW.category",
+        ),
+        _trigger(
+            "stats_own_insert",
+            "AFTER INSERT ON owns",
+            _stats_own(
+                "NEW", _owned("NEW", "user_own"), _owned("NEW", "root_own")
+            ),
+        ),
+        _trigger(
+            "stats_own_update",
+            "AFTER UPDATE OF user_own, root_own ON owns",
+            _stats_own(
+                "NEW",
+                f"{_owned('NEW', 'user_own')} - {_owned('OLD', 'user_own')}",
+                f"{_owned('NEW', 'root_own')} - {_owned('OLD', 'root_own')}",
+            ),
+        ),
+    ]
+)
 
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB)
+    def __init__(self, path=DB, readonly=False):
+        self.path = path
+        self.user_id = None
+        # Read-only connections leave the schema to the writer
+        if readonly:
+            uri = f"{pathlib.Path(path).absolute().as_uri()}?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True)
+        else:
+            self.conn = sqlite3.connect(path)
         self.cursor = self.conn.cursor()
-        self.setup()
+        if not readonly:
+            self.setup()
 
     def setup(self):
         self.cursor.executescript(
             """
             CREATE TABLE IF NOT EXISTS vpns (
                 id INTEGER PRIMARY KEY,
-                name TEXT
+                name TEXT,
+                hostname TEXT,
+                latency REAL,
+                probed_at REAL
             );
 
             CREATE TABLE IF NOT EXISTS machines (
@@ -23,9 +201,41 @@ class Database:
                 difficulty TEXT,
                 os TEXT,
                 free INTEGER,
-                active INTEGER,
-                user_own INTEGER,
-                root_own INTEGER
+                active INTEGER
+            );
+
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value
+            );
+
+            CREATE TABLE IF NOT EXISTS accounts (
+                token_hash TEXT PRIMARY KEY,
+                user_id INTEGER,
+                name TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS owns (
+                user_id INTEGER,
+                machine_id INTEGER,
+                user_own INTEGER DEFAULT 0,
+                root_own INTEGER DEFAULT 0,
+                FOREIGN KEY (machine_id) REFERENCES machines(id),
+                PRIMARY KEY (user_id, machine_id)
+            );
+
+            CREATE TABLE IF NOT EXISTS spawn_times (
+                machine_id INTEGER,
+                vpn_id INTEGER,
+                seconds REAL,
+                recorded_at REAL
+            );
+
+            CREATE TABLE IF NOT EXISTS vpn_files (
+                user_id INTEGER,
+                vpn_id INTEGER,
+                sha256 TEXT,
+                PRIMARY KEY (user_id, vpn_id)
             );
 
             CREATE TABLE IF NOT EXISTS tags (
@@ -34,6 +244,9 @@ class Database:
                 name TEXT
             );
 
+            CREATE INDEX IF NOT EXISTS machines_name
+            ON machines (name COLLATE NOCASE);
+
             CREATE TABLE IF NOT EXISTS machine_tag (
                 machine_id INTEGER,
                 tag_id INTEGER,
@@ -41,8 +254,144 @@ class Database:
                 FOREIGN KEY (tag_id) REFERENCES tags(id),
                 PRIMARY KEY (machine_id, tag_id)
             );
+
+            CREATE TABLE IF NOT EXISTS stats (
+                dimension TEXT,
+                key TEXT,
+                total INTEGER,
+                PRIMARY KEY (dimension, key)
+            );
+
+            CREATE TABLE IF NOT EXISTS stats_own (
+                user_id INTEGER,
+                dimension TEXT,
+                key TEXT,
+                user_own INTEGER,
+                root_own INTEGER,
+                PRIMARY KEY (user_id, dimension, key)
+            );
             """
         )
+        self.cursor.executescript(STATS_SQL)
+        # Databases from before latency probing lack the endpoint columns
+        self.cursor.execute("PRAGMA table_info(vpns)")
+        columns = [col[1] for col in self.cursor.fetchall()]
+        for column, kind in [
+            ("hostname", "TEXT"),
+            ("latency", "REAL"),
+            ("probed_at", "REAL"),
+        ]:
+            if column not in columns:
+                self.cursor.execute(
+                    f"ALTER TABLE vpns ADD COLUMN {column} {kind}"
+                )
+        # Databases from before the stats, or catalogs written without them
+        self.cursor.execute("SELECT EXISTS (SELECT 1 FROM stats)")
+        if not self.cursor.fetchone()[0]:
+            self.stats_rebuild()
+
+    def stats_rebuild(self):
+        self.cursor.execute("DELETE FROM stats")
+        self.cursor.execute("DELETE FROM stats_own")
+        self.cursor.execute(
+            "INSERT INTO stats (dimension, key, total) "
+            "SELECT dimension, key, COUNT(*) FROM machine_keys "
+            "GROUP BY dimension, key"
+        )
+        self.cursor.execute(
+            "INSERT INTO stats_own "
+            "(user_id, dimension, key, user_own, root_own) "
+            "SELECT owns.user_id, dimension, key, "
+            "SUM(COALESCE(owns.user_own, 0)), SUM(COALESCE(owns.root_own, 0)) "
+            "FROM owns JOIN machine_keys USING (machine_id) "
+            "GROUP BY owns.user_id, dimension, key"
+        )
+        self.conn.commit()
+
+    # Counters kept by triggers, no scan of the catalog is needed
+    def stats(self, dimension):
+        self.cursor.execute(
+            "SELECT stats.key, COALESCE(stats_own.user_own, 0), "
+            "COALESCE(stats_own.root_own, 0), stats.total "
+            "FROM stats "
+            "LEFT JOIN stats_own ON stats_own.dimension = stats.dimension "
+            "AND stats_own.key = stats.key AND stats_own.user_id = ? "
+            "WHERE stats.dimension = ? AND stats.total > 0 "
+            "ORDER BY stats.total DESC, stats.key",
+            [self.user_id, dimension],
+        )
+        return self.cursor.fetchall()
+
+    def meta_get(self, key, default=None):
+        self.cursor.execute("SELECT value FROM meta WHERE key = ?", [key])
+        row = self.cursor.fetchone()
+        return row[0] if row else default
+
+    def meta_set(self, key, value):
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [key, value],
+        )
+        self.conn.commit()
+
+    def catalog_dump(self):
+        data = {}
+        for table, columns in CATALOG.items():
+            self.cursor.execute(
+                f"SELECT {', '.join(columns)} FROM {table} ORDER BY 1"
+            )
+            data[table] = self.cursor.fetchall()
+        return data
+
+    # Bulk load in a single transaction, newer rows update older ones in place
+    # so the stats triggers see an update rather than a silent replace
+    def catalog_load(self, data):
+        for table, columns in CATALOG.items():
+            keys = columns[: CATALOG_KEYS[table]]
+            values = columns[CATALOG_KEYS[table] :]
+            update = ", ".join(f"{col} = excluded.{col}" for col in values)
+            action = f"DO UPDATE SET {update}" if update else "DO NOTHING"
+            self.cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT ({', '.join(keys)}) {action}",
+                data[table],
+            )
+        self.conn.commit()
+
+    def account(self, token_hash):
+        self.cursor.execute(
+            "SELECT user_id FROM accounts WHERE token_hash = ?", [token_hash]
+        )
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def account_add(self, token_hash, user_id, name):
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO accounts (token_hash, user_id, name) "
+            "VALUES (?, ?, ?)",
+            [token_hash, user_id, name],
+        )
+        self.conn.commit()
+
+    def set_user(self, user_id):
+        self.user_id = user_id
+
+    # Databases from before per-user owns kept them in machines
+    def owns_migrate(self, user_id):
+        self.cursor.execute("PRAGMA table_info(machines)")
+        if "user_own" in [col[1] for col in self.cursor.fetchall()]:
+            self.cursor.execute(
+                "INSERT OR IGNORE INTO owns "
+                "(user_id, machine_id, user_own, root_own) "
+                "SELECT ?, id, user_own, root_own FROM machines "
+                "WHERE user_own = 1 OR root_own = 1",
+                [user_id],
+            )
+            self.cursor.execute(
+                "UPDATE machines SET user_own = NULL, root_own = NULL"
+            )
+            self.conn.commit()
 
     def _int2ico(self, value1, value2=None):
         if value2 is not None:
@@ -52,13 +401,15 @@ class Database:
     def machines_with_tags(self):
         self.cursor.execute(
             "SELECT machines.name, machines.difficulty, "
-            "machines.os, machines.free, machines.user_own, machines.root_own, "
+            f"machines.os, machines.free, {OWNS}, "
             "GROUP_CONCAT(tags.name, ',') AS tags "
             "FROM machines "
+            f"{OWNS_JOIN}"
             "LEFT JOIN machine_tag ON machines.id = machine_tag.machine_id "
             "LEFT JOIN tags ON machine_tag.tag_id = tags.id "
             "GROUP BY machines.id, machines.name "
-            "ORDER BY machines.free DESC, machines.name"
+            "ORDER BY machines.free DESC, machines.name",
+            [self.user_id],
         )
         return [
             (n, d, o, self._int2ico(f), self._int2ico(u, r), t)
@@ -84,22 +435,40 @@ class Database:
             for machine in data[machine_type]
         ]
 
-    def machine_add(self, data):
+    def machine_add(self, data, user_id=None):
+        user_id = self.user_id if user_id is None else user_id
         insert = self._machine_parse(data, "active")
         if "retired" in data:
             insert.extend(self._machine_parse(data, "retired"))
+        # The catalog is shared, owns are kept per account
         self.cursor.executemany(
             "INSERT OR IGNORE INTO machines "
-            "(id, name, difficulty, os, free, active, user_own, root_own) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            insert,
+            "(id, name, difficulty, os, free, active) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [machine[:6] for machine in insert],
         )
+        if user_id is not None:
+            self.cursor.executemany(
+                "INSERT INTO owns (user_id, machine_id, user_own, root_own) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, machine_id) DO UPDATE SET "
+                "user_own = MAX(user_own, excluded.user_own), "
+                "root_own = MAX(root_own, excluded.root_own)",
+                [
+                    (user_id, m_id, user_own, root_own)
+                    for (m_id, *_, user_own, root_own) in insert
+                    if user_own or root_own
+                ],
+            )
         self.conn.commit()
 
     def machine_own(self, id, own_type):
         self.cursor.execute(
-            f"UPDATE machines SET {own_type}_own = 1 WHERE id = ?",
-            [id],
+            f"INSERT INTO owns (user_id, machine_id, {own_type}_own) "
+            "VALUES (?, ?, 1) "
+            "ON CONFLICT (user_id, machine_id) "
+            f"DO UPDATE SET {own_type}_own = 1",
+            [self.user_id, id],
         )
         self.conn.commit()
 
@@ -107,6 +476,13 @@ class Database:
         self.cursor.execute("SELECT name FROM machines WHERE id = ?", [id])
         return self.cursor.fetchone()[0]
 
+    def machine_id_by_name(self, name):
+        self.cursor.execute(
+            "SELECT id FROM machines WHERE name = ? COLLATE NOCASE", [name]
+        )
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
     def machines_reset_free_active(self):
         self.cursor.execute("UPDATE machines SET free = 0, active = 0 ")
         self.conn.commit()
@@ -139,18 +515,33 @@ class Database:
         )
         return [d for (d,) in self.cursor.fetchall()]
 
-    def machines_by_vip(self, vip):
-        if vip:
-            self.cursor.execute("SELECT name, id FROM machines ORDER BY name")
-        else:
+    def machines_by_prefix(self, query, vip, limit=10):
+        pattern = (
+            query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+        free = "" if vip else "AND free = 1 "
+        # Prefix matches can use the name index, fill up with substrings
+        self.cursor.execute(
+            "SELECT name, id FROM machines "
+            f"WHERE name LIKE ? ESCAPE '\\' {free}"
+            "ORDER BY name COLLATE NOCASE LIMIT ?",
+            [f"{pattern}%", limit],
+        )
+        result = self.cursor.fetchall()
+        if query and len(result) < limit:
             self.cursor.execute(
-                "SELECT name, id FROM machines WHERE free = 1 ORDER BY name",
+                "SELECT name, id FROM machines "
+                "WHERE name LIKE ? ESCAPE '\\' "
+                f"AND name NOT LIKE ? ESCAPE '\\' {free}"
+                "ORDER BY name COLLATE NOCASE LIMIT ?",
+                [f"%{pattern}%", f"{pattern}%", limit - len(result)],
             )
-        return self.cursor.fetchall()
+            result.extend(self.cursor.fetchall())
+        return result
 
     def machines_by_filters(self, filters):
         condition = ""
-        params = []
+        params = [self.user_id]
         tags = []
         tags_params = []
         for a in ["category", "area", "vulnerability"]:
@@ -162,10 +553,13 @@ class Database:
             if k == "status":
                 if v == "Complete":
                     condition += (
-                        "WHERE machines.user_own = 1 AND machines.root_own = 1 "
+                        "WHERE owns.user_own = 1 AND owns.root_own = 1 "
                     )
                 elif v == "Incomplete":
-                    condition += "WHERE (machines.user_own = 0 OR machines.root_own = 0) "
+                    condition += (
+                        "WHERE (COALESCE(owns.user_own, 0) = 0 "
+                        "OR COALESCE(owns.root_own, 0) = 0) "
+                    )
                 else:
                     first = True
             elif v and k in ["os", "difficulty"]:
@@ -183,9 +577,10 @@ class Database:
             params.extend(tags_params)
         self.cursor.execute(
             f"SELECT machines.name, machines.difficulty, "
-            f"machines.os, machines.free, machines.user_own, machines.root_own, "
+            f"machines.os, machines.free, {OWNS}, "
             f"GROUP_CONCAT(tags.name, ',') AS tags "
             f"FROM machines "
+            f"{OWNS_JOIN}"
             f"LEFT JOIN machine_tag ON machines.id = machine_tag.machine_id "
             f"LEFT JOIN tags ON machine_tag.tag_id = tags.id "
             f"{condition}"
@@ -212,23 +607,63 @@ class Database:
     def machines_by_name(self, name):
         self.cursor.execute(
             "SELECT machines.name, machines.difficulty, "
-            "machines.os, machines.free, machines.user_own, machines.root_own, "
+            f"machines.os, machines.free, {OWNS}, "
             "GROUP_CONCAT(tags.name, ',') AS tags "
             "FROM machines "
+            f"{OWNS_JOIN}"
             "LEFT JOIN machine_tag ON machines.id = machine_tag.machine_id "
             "LEFT JOIN tags ON machine_tag.tag_id = tags.id "
             "WHERE machines.name LIKE ?"
             "GROUP BY machines.id, machines.name "
             "ORDER BY machines.free DESC, machines.name",
-            [f"%{name}%"],
+            [self.user_id, f"%{name}%"],
         )
         return [
             (n, d, o, self._int2ico(f), self._int2ico(u, r), t)
             for (n, d, o, f, u, r, t) in self.cursor.fetchall()
         ]
 
+    # Fastest servers first, unprobed or unreachable ones last
     def vpn_list(self):
-        self.cursor.execute("SELECT name, id FROM vpns")
+        self.cursor.execute(
+            "SELECT name, id, latency FROM vpns "
+            "ORDER BY latency IS NULL, latency, id"
+        )
+        return self.cursor.fetchall()
+
+    def vpn_endpoints(self):
+        self.cursor.execute(
+            "SELECT id, hostname FROM vpns WHERE hostname IS NOT NULL"
+        )
+        return self.cursor.fetchall()
+
+    def vpn_probed_at(self):
+        self.cursor.execute(
+            "SELECT MIN(COALESCE(probed_at, 0)) FROM vpns "
+            "WHERE hostname IS NOT NULL"
+        )
+        return self.cursor.fetchone()[0]
+
+    def vpn_latency_add(self, data, probed_at):
+        self.cursor.executemany(
+            "UPDATE vpns SET latency = ?, probed_at = ? WHERE id = ?",
+            [(latency, probed_at, vpn_id) for vpn_id, latency in data],
+        )
+        self.conn.commit()
+
+    def spawn_time_add(self, machine_id, vpn_id, seconds):
+        self.cursor.execute(
+            "INSERT INTO spawn_times "
+            "(machine_id, vpn_id, seconds, recorded_at) VALUES (?, ?, ?, ?)",
+            [machine_id, vpn_id, seconds, time.time()],
+        )
+        self.conn.commit()
+
+    def spawn_stats(self):
+        self.cursor.execute(
+            "SELECT vpn_id, COUNT(*), AVG(seconds), MAX(seconds) "
+            "FROM spawn_times GROUP BY vpn_id"
+        )
         return self.cursor.fetchall()
 
     def vpn_count(self):
@@ -237,17 +672,35 @@ class Database:
 
     def vpn_add(self, data):
         insert = [
-            (server["id"], server["friendly_name"])
+            (server["id"], server["friendly_name"], server.get("hostname"))
             for region in data["options"].values()
             for info in region.values()
             for server in info["servers"].values()
         ]
         self.cursor.executemany(
-            "INSERT OR IGNORE INTO vpns (id, name) VALUES (?, ?)",
+            "INSERT INTO vpns (id, name, hostname) VALUES (?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET "
+            "name = excluded.name, hostname = excluded.hostname",
             insert,
         )
         self.conn.commit()
 
+    def vpn_file(self, user_id, vpn_id):
+        self.cursor.execute(
+            "SELECT sha256 FROM vpn_files WHERE user_id = ? AND vpn_id = ?",
+            [user_id, vpn_id],
+        )
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def vpn_file_add(self, user_id, vpn_id, sha256):
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO vpn_files (user_id, vpn_id, sha256) "
+            "VALUES (?, ?, ?)",
+            [user_id, vpn_id, sha256],
+        )
+        self.conn.commit()
+
     def tag_add(self, data):
         self.cursor.executemany(
             "INSERT OR IGNORE INTO tags (id, category, name) VALUES (?, ?, ?)",
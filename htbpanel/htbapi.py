@@ -1,13 +1,63 @@
 import asyncio
+import hashlib
+import os
+import shutil
 
-from tqdm import tqdm, trange
-
-API = "https://labs.hackthebox.com/api/v4"
+API = os.environ.get("HTB_API", "https://labs.hackthebox.com/api/v4")
 SLEEP = 2.5
+RETRIES = 3
+INFLIGHT = {}
+VPN_CACHE = "htbpanel_vpn"
+CHUNK = 65536
+
+
+def retry_after(res, attempt):
+    try:
+        return float(res.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return 2**attempt
+
+
+async def wait(client, seconds):
+    metrics = getattr(client, "metrics", None)
+    if metrics is not None:
+        metrics.wait(seconds)
+    await asyncio.sleep(seconds)
+
+
+# Retry rate limited requests, and server errors when it is safe to do so
+async def request(client, method, url, **kwargs):
+    retries = getattr(client, "retries", RETRIES)
+    for attempt in range(retries + 1):
+        res = await client.request(method, url, **kwargs)
+        retry = res.status_code == 429 or (
+            method == "GET" and res.status_code >= 500
+        )
+        if not retry or attempt == retries:
+            return res
+        await wait(client, retry_after(res, attempt))
+
+
+async def get(client, url, **kwargs):
+    return await request(client, "GET", url, **kwargs)
+
+
+async def post(client, url, **kwargs):
+    return await request(client, "POST", url, **kwargs)
+
+
+# Share a single in-flight request between identical concurrent calls
+async def single_flight(key, func, *args):
+    task = INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(func(*args))
+        INFLIGHT[key] = task
+        task.add_done_callback(lambda _: INFLIGHT.pop(key, None))
+    return await asyncio.shield(task)
 
 
 async def query_user_info(client):
-    res = await client.get(f"{API}/user/info")
+    res = await get(client, f"{API}/user/info")
     data = res.json()["info"]
     return {
         "user": {
@@ -18,10 +68,17 @@ async def query_user_info(client):
     }
 
 
-# Only VIP/VIP+ machines return IP
+async def query_active(client):
+    res = await get(client, f"{API}/machine/active")
+    return res.json()["info"]
+
+
 async def query_current_box(client):
-    res = await client.get(f"{API}/machine/active")
-    data = res.json()["info"]
+    return await query_box(client, await query_active(client))
+
+
+# Only VIP/VIP+ machines return IP
+async def query_box(client, data):
     out = {"current_box": None}
     if data is not None:
         info = await query_box_info(client, data["name"])
@@ -38,19 +95,21 @@ async def query_current_box(client):
 
 
 async def query_box_info(client, name):
-    res = await client.get(f"{API}/machine/profile/{name}")
+    res = await get(client, f"{API}/machine/profile/{name}")
     return res.json()["info"]
 
 
 async def query_vpn_servers(client):
-    res = await client.get(
-        f"{API}/connections/servers", params={"product": "release_arena"}
+    res = await get(
+        client,
+        f"{API}/connections/servers",
+        params={"product": "release_arena"},
     )
     return res.json()["data"]
 
 
 async def query_current_vpn(client):
-    res = await client.get(f"{API}/connection/status")
+    res = await get(client, f"{API}/connection/status")
     data = res.json()
     out = {"current_vpn": {}}
     if data:
@@ -73,33 +132,41 @@ async def query_boxes(client):
 
 
 async def query_active_boxes(client):
-    res = await client.get(f"{API}/machine/paginated", params={"per_page": 100})
+    res = await get(
+        client, f"{API}/machine/paginated", params={"per_page": 100}
+    )
     data = res.json()
     return data["data"]
 
 
 async def query_retired_boxes(client):
+    from tqdm import trange
+
     total = []
-    res = await client.get(
-        f"{API}/machine/list/retired/paginated", params={"per_page": 100}
+    res = await get(
+        client,
+        f"{API}/machine/list/retired/paginated",
+        params={"per_page": 100},
     )
     data = res.json()
     total.extend(data["data"])
     for page in trange(
         2, data["meta"]["last_page"] + 1, desc="Querying retired boxes"
     ):
-        res = await client.get(
+        res = await get(
+            client,
             f"{API}/machine/list/retired/paginated",
             params={"per_page": 100, "page": page},
         )
         data = res.json()
         total.extend(data["data"])
-        await asyncio.sleep(SLEEP)
+        await wait(client, SLEEP)
     return total
 
 
 async def query_retired_free_boxes(client):
-    res = await client.get(
+    res = await get(
+        client,
         f"{API}/machine/list/retired/paginated",
         params={"per_page": 100, "free": 1},
     )
@@ -126,52 +193,152 @@ async def query_new_boxes(client, db):
 
 
 async def query_tags(client, missing):
+    from tqdm import tqdm
+
     total_tags = []
     total_relations = []
     for m_id in tqdm(missing, desc="Querying box tags"):
-        res = await client.get(f"{API}/machine/tags/{m_id}")
+        res = await get(client, f"{API}/machine/tags/{m_id}")
         data = res.json()["info"]
         for tag in data:
             total_tags.append((tag["id"], tag["category"], tag["name"]))
             total_relations.append((m_id, tag["id"]))
-        await asyncio.sleep(SLEEP)
+        await wait(client, SLEEP)
     return total_tags, total_relations
 
 
 async def machine_action(client, action, machine_id):
+    return await single_flight(
+        (client, action, machine_id),
+        _machine_action,
+        client,
+        action,
+        machine_id,
+    )
+
+
+async def _machine_action(client, action, machine_id):
     match action:
         case "start":
-            res = await client.post(
-                f"{API}/vm/spawn", json={"machine_id": machine_id}
+            res = await post(
+                client, f"{API}/vm/spawn", json={"machine_id": machine_id}
             )
         case "stop":
-            res = await client.post(
-                f"{API}/vm/terminate", json={"machine_id": machine_id}
+            res = await post(
+                client, f"{API}/vm/terminate", json={"machine_id": machine_id}
             )
         case "reset":
-            res = await client.post(
-                f"{API}/vm/reset", json={"machine_id": machine_id}
+            res = await post(
+                client, f"{API}/vm/reset", json={"machine_id": machine_id}
             )
     return res.status_code == 200, res.json()["message"]
 
 
 async def submit_flag(client, machine_id, flag):
-    res = await client.post(
-        f"{API}/machine/own", json={"id": machine_id, "flag": flag}
+    return await single_flight(
+        (client, "own", machine_id, flag),
+        _submit_flag,
+        client,
+        machine_id,
+        flag,
+    )
+
+
+async def _submit_flag(client, machine_id, flag):
+    res = await post(
+        client, f"{API}/machine/own", json={"id": machine_id, "flag": flag}
     )
     return res.json()
 
 
 async def switch_vpn(client, info, vpn_id):
     if info["current_vpn"]["id"] != vpn_id:
-        await client.post(f"{API}/connections/servers/switch/{vpn_id}")
+        await post(client, f"{API}/connections/servers/switch/{vpn_id}")
         return True
     return False
 
 
-async def download_vpn(client, info, vpn_id):
-    data = await client.get(f"{API}/access/ovpnfile/{vpn_id}/0")
+def sha256_file(path):
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+# Readers of dst see either the old file or the new one, never a partial copy
+# VPN configs hold the account's client key, keep them private
+def open_private(path):
+    return os.fdopen(
+        os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb"
+    )
+
+
+# mkstemp creates the file 0600 under a name no other copy uses
+def copy_atomic(src, dst):
+    # Only needed when switching servers, keep it off the startup path
+    import tempfile
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out, open(src, "rb") as f:
+            shutil.copyfileobj(f, out)
+        os.replace(tmp, dst)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+async def save_stream(res):
+    os.makedirs(VPN_CACHE, mode=0o700, exist_ok=True)
+    # Caches created before configs were kept private
+    os.chmod(VPN_CACHE, 0o700)
+    tmp = os.path.join(VPN_CACHE, f".{os.getpid()}.{id(res)}.tmp")
+    digest = hashlib.sha256()
+    f = await asyncio.to_thread(open_private, tmp)
+    try:
+        async for chunk in res.aiter_bytes():
+            digest.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        f.close()
+        os.unlink(tmp)
+        raise
+    await asyncio.to_thread(f.close)
+    os.replace(tmp, os.path.join(VPN_CACHE, f"{digest.hexdigest()}.ovpn"))
+    return digest.hexdigest()
+
+
+async def stream_vpn(client, vpn_id):
+    url = f"{API}/access/ovpnfile/{vpn_id}/0"
+    retries = getattr(client, "retries", RETRIES)
+    for attempt in range(retries + 1):
+        async with client.stream("GET", url) as res:
+            if res.status_code == 200:
+                return await save_stream(res)
+            if res.status_code != 429 and res.status_code < 500:
+                return None
+            delay = retry_after(res, attempt)
+        if attempt < retries:
+            await wait(client, delay)
+    return None
+
+
+# Config files are stored once by checksum and indexed per (user, vpn)
+async def download_vpn(client, db, info, vpn_id):
+    user_id = info["user"]["id"]
     file = f"htbpanel_{info['user']['name']}.ovpn"
-    with open(file, "wb") as f:
-        f.write(data.content)
+    digest = db.vpn_file(user_id, vpn_id)
+    cached = os.path.join(VPN_CACHE, f"{digest}.ovpn")
+    if digest is None or await asyncio.to_thread(sha256_file, cached) != digest:
+        digest = await stream_vpn(client, vpn_id)
+        if digest is None:
+            return None
+        db.vpn_file_add(user_id, vpn_id, digest)
+        cached = os.path.join(VPN_CACHE, f"{digest}.ovpn")
+    if await asyncio.to_thread(sha256_file, file) != digest:
+        await asyncio.to_thread(copy_atomic, cached, file)
     return file
@@ -0,0 +1,216 @@
+import json
+import os
+import re
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+TEMPLATES = [
+    (re.compile(r"/machine/tags/\d+$"), "/machine/tags/{id}"),
+    (re.compile(r"/machine/profile/[^/]+$"), "/machine/profile/{name}"),
+    (re.compile(r"/access/ovpnfile/\d+/0$"), "/access/ovpnfile/{id}/0"),
+    (
+        re.compile(r"/connections/servers/switch/\d+$"),
+        "/connections/servers/switch/{id}",
+    ),
+]
+
+
+def endpoint(request):
+    path = request.url.path.partition("/api/v4")[2] or request.url.path
+    for pattern, template in TEMPLATES:
+        if pattern.search(path):
+            return f"{request.method} {template}"
+    return f"{request.method} {path}"
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.statuses = Counter()
+        self.sent = 0
+        self.received = 0
+        self.latency = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def record(self, status, elapsed, sent, received):
+        self.count += 1
+        self.statuses[status] += 1
+        self.sent += sent
+        self.received += received
+        self.latency += elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+        for idx, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                self.buckets[idx] += 1
+                break
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.endpoints = defaultdict(EndpointStats)
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def record(self, name, status, elapsed, sent, received):
+        self.endpoints[name].record(status, elapsed, sent, received)
+
+    def wait(self, seconds):
+        self.waits += 1
+        self.wait_seconds += seconds
+
+    def summary(self):
+        return [
+            (
+                name,
+                stats.count,
+                " ".join(f"{k}:{v}" for k, v in sorted(stats.statuses.items())),
+                f"{stats.sent / 1024:.1f}",
+                f"{stats.received / 1024:.1f}",
+                f"{stats.latency / stats.count * 1000:.0f}",
+                f"{stats.latency_max * 1000:.0f}",
+            )
+            for name, stats in sorted(self.endpoints.items())
+        ]
+
+    # Everything the API tab shows, in one call for attached sessions
+    def snapshot(self):
+        return self.waits, self.wait_seconds, self.summary()
+
+    def to_json(self):
+        return {
+            "started": self.started,
+            "rate_limit_waits": self.waits,
+            "rate_limit_wait_seconds": self.wait_seconds,
+            "endpoints": {
+                name: {
+                    "requests": stats.count,
+                    "statuses": dict(stats.statuses),
+                    "bytes_sent": stats.sent,
+                    "bytes_received": stats.received,
+                    "latency_seconds_sum": stats.latency,
+                    "latency_seconds_max": stats.latency_max,
+                    "latency_buckets": dict(
+                        zip(map(str, BUCKETS), stats.buckets)
+                    ),
+                }
+                for name, stats in self.endpoints.items()
+            },
+        }
+
+    # Each family is one contiguous group, as the exposition format requires
+    def to_prometheus(self):
+        endpoints = [
+            (f'endpoint="{name}"', stats)
+            for name, stats in sorted(self.endpoints.items())
+        ]
+        lines = ["# TYPE htbpanel_api_requests_total counter"]
+        for label, stats in endpoints:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(
+                    f"htbpanel_api_requests_total"
+                    f'{{{label},status="{status}"}} {count}'
+                )
+        lines.append("# TYPE htbpanel_api_bytes_sent_total counter")
+        for label, stats in endpoints:
+            lines.append(
+                f"htbpanel_api_bytes_sent_total{{{label}}} {stats.sent}"
+            )
+        lines.append("# TYPE htbpanel_api_bytes_received_total counter")
+        for label, stats in endpoints:
+            lines.append(
+                f"htbpanel_api_bytes_received_total{{{label}}} {stats.received}"
+            )
+        lines.append("# TYPE htbpanel_api_latency_seconds histogram")
+        for label, stats in endpoints:
+            total = 0
+            for bound, count in zip(BUCKETS, stats.buckets):
+                total += count
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(
+                    f"htbpanel_api_latency_seconds_bucket"
+                    f'{{{label},le="{le}"}} {total}'
+                )
+            lines.append(
+                f"htbpanel_api_latency_seconds_sum{{{label}}} {stats.latency}"
+            )
+            lines.append(
+                f"htbpanel_api_latency_seconds_count{{{label}}} {stats.count}"
+            )
+        lines += [
+            "# TYPE htbpanel_api_rate_limit_waits_total counter",
+            f"htbpanel_api_rate_limit_waits_total {self.waits}",
+            "# TYPE htbpanel_api_rate_limit_wait_seconds_total counter",
+            "htbpanel_api_rate_limit_wait_seconds_total "
+            f"{self.wait_seconds}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        if path.endswith(".prom"):
+            write_atomic(path, self.to_prometheus())
+        else:
+            write_atomic(path, json.dumps(self.to_json(), indent=2))
+        return path
+
+
+# Scrapers and readers never see a half written file
+def write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class MetricsStream(httpx.AsyncByteStream):
+    def __init__(self, stream, on_close):
+        self.stream = stream
+        self.on_close = on_close
+        self.received = 0
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            self.received += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        await self.stream.aclose()
+        self.on_close(self.received)
+
+
+# Record every request once its body has been consumed or closed
+class MetricsTransport(httpx.AsyncBaseTransport):
+    def __init__(self, metrics, transport=None):
+        self.metrics = metrics
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        try:
+            sent = len(request.content)
+        except httpx.RequestNotRead:
+            sent = 0
+
+        def on_close(received):
+            self.metrics.record(
+                endpoint(request),
+                response.status_code,
+                time.perf_counter() - start,
+                sent,
+                received,
+            )
+
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=MetricsStream(response.stream, on_close),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,58 @@
+import asyncio
+from collections import OrderedDict
+
+import htbpanel.htbapi as api
+
+CONCURRENCY = 2
+CACHE = 256
+# Rows around the cursor fetched ahead of time
+AHEAD = 2
+
+
+# Machine profiles for the rows around the cursor, fetched in the background
+class Prefetcher:
+    def __init__(self, client, concurrency=CONCURRENCY, size=CACHE):
+        self.client = client
+        self.size = size
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.slots = asyncio.Semaphore(concurrency)
+
+    def cached(self, name):
+        info = self.cache.get(name)
+        if info is not None:
+            self.cache.move_to_end(name)
+        return info
+
+    async def fetch(self, name):
+        async with self.slots:
+            info = await api.query_box_info(self.client, name)
+        self.cache[name] = info
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return info
+
+    def done(self, name, task):
+        if self.pending.get(name) is task:
+            del self.pending[name]
+        # Failed prefetches are retried on the next visit, not reported
+        if not task.cancelled():
+            task.exception()
+
+    # Requests for rows the cursor already left are cancelled
+    def schedule(self, names):
+        for name in list(self.pending):
+            if name not in names:
+                self.pending.pop(name).cancel()
+        for name in names:
+            if name not in self.cache and name not in self.pending:
+                task = asyncio.ensure_future(self.fetch(name))
+                self.pending[name] = task
+                task.add_done_callback(lambda t, n=name: self.done(n, t))
+
+    async def get(self, name, neighbours=()):
+        self.schedule([name, *neighbours])
+        info = self.cached(name)
+        if info is not None:
+            return info
+        return await asyncio.shield(self.pending[name])
@@ -0,0 +1,64 @@
+import asyncio
+import socket
+import time
+
+# OpenVPN listens on UDP, a TCP handshake (or its reset) still takes one RTT
+PORT = 443
+TIMEOUT = 2
+CONCURRENCY = 16
+# Probes older than this are repeated when the TUI starts
+TTL = 3600
+
+
+async def rtt(host, port=PORT, timeout=TIMEOUT):
+    loop = asyncio.get_running_loop()
+    try:
+        addresses = await asyncio.wait_for(
+            loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return None
+    # Resolve first so DNS does not count towards the latency
+    address = addresses[0][4]
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(address[0], address[1]), timeout
+        )
+    except ConnectionRefusedError:
+        return time.perf_counter() - start
+    except (OSError, asyncio.TimeoutError):
+        return None
+    elapsed = time.perf_counter() - start
+    writer.close()
+    return elapsed
+
+
+# Endpoints are (vpn_id, host, port), results map vpn_id to seconds or None
+async def probe(endpoints, concurrency=CONCURRENCY, timeout=TIMEOUT):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def measure(host, port):
+        async with slots:
+            return await rtt(host, port, timeout)
+
+    results = await asyncio.gather(
+        *[measure(host, port) for _, host, port in endpoints]
+    )
+    return {vpn_id: res for (vpn_id, _, _), res in zip(endpoints, results)}
+
+
+async def update(db, port=PORT, **kwargs):
+    endpoints = [(vpn_id, host, port) for vpn_id, host in db.vpn_endpoints()]
+    results = await probe(endpoints, **kwargs)
+    db.vpn_latency_add(list(results.items()), time.time())
+    return results
+
+
+NO_HOSTNAMES = "No VPN server has a hostname, latencies cannot be measured"
+
+
+# None when no server has a hostname, there is nothing to probe then
+def stale(db):
+    probed = db.vpn_probed_at()
+    return probed is not None and time.time() - probed > TTL
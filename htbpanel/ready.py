@@ -0,0 +1,44 @@
+import asyncio
+
+import htbpanel.htbapi as api
+
+FIRST = 2
+FACTOR = 1.5
+LONGEST = 15
+TIMEOUT = 600
+# Right after a start the API may not list the box as active yet
+GRACE = 10
+
+
+# Poll the cheap /machine/active with backoff, fetch the profile only once
+async def wait_ready(
+    client, timeout=TIMEOUT, db=None, vpn_id=None, on_poll=None, grace=GRACE
+):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    delay = FIRST
+    spawning = False
+    seen = False
+    while True:
+        data = await api.query_active(client)
+        if on_poll is not None:
+            on_poll(data)
+        elapsed = loop.time() - start
+        if elapsed >= timeout:
+            break
+        if data is None:
+            if seen or elapsed >= grace:
+                break
+        elif not data.get("isSpawning"):
+            break
+        else:
+            spawning = True
+        seen = seen or data is not None
+        await asyncio.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * FACTOR, LONGEST)
+    box = (await api.query_box(client, data))["current_box"]
+    # Only spawns seen from the start of polling tell how long they take
+    if spawning and box is not None and not data.get("isSpawning"):
+        if db is not None:
+            db.spawn_time_add(box["id"], vpn_id, elapsed)
+    return box
@@ -0,0 +1,36 @@
+import shlex
+import subprocess
+import sys
+import time
+
+from textual_serve.server import Server
+
+from htbpanel.daemon import listening
+
+
+# Sessions are separate processes attached to one daemon, which holds the
+# catalog, caches, database connections and API client for all of them
+def serve(args):
+    daemon = None
+    if not listening(args.socket):
+        daemon = subprocess.Popen(
+            [sys.executable, "-m", "htbpanel", "daemon", "-s", args.socket]
+        )
+        # The first start may sync the whole catalog before listening
+        while not listening(args.socket):
+            if daemon.poll() is not None:
+                print("Error: the daemon did not start")
+                exit(1)
+            time.sleep(0.1)
+    server = Server(
+        shlex.join([sys.executable, "-m", "htbpanel", "-a", "-s", args.socket]),
+        host=args.host,
+        port=args.port,
+        title="HTBPanel",
+    )
+    try:
+        server.serve()
+    finally:
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait()
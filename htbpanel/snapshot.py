@@ -0,0 +1,96 @@
+import time
+import zlib
+
+import msgpack
+
+from htbpanel.database import CATALOG
+
+# 2 added the VPN hostnames
+VERSION = 2
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def load(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        snapshot = msgpack.unpackb(zlib.decompress(data), raw=False)
+    except (zlib.error, ValueError, msgpack.UnpackException) as e:
+        raise SnapshotError(f"{path} is not a snapshot: {e}") from e
+    if not isinstance(snapshot, dict):
+        raise SnapshotError(f"{path} is not a snapshot")
+    if snapshot.get("version") == 1:
+        raise SnapshotError(
+            "Snapshot version 1 lacks VPN hostnames, export it again"
+        )
+    if snapshot.get("version") != VERSION:
+        raise SnapshotError(
+            f"Unsupported snapshot version {snapshot.get('version')}"
+        )
+    missing = [
+        key for key in ["created", "base", *CATALOG] if key not in snapshot
+    ]
+    if missing:
+        raise SnapshotError(f"Snapshot lacks {', '.join(missing)}")
+    if not number(snapshot["created"]) or not (
+        snapshot["base"] is None or number(snapshot["base"])
+    ):
+        raise SnapshotError("Snapshot timestamps are not numbers")
+    for table, columns in CATALOG.items():
+        rows = snapshot[table]
+        if not isinstance(rows, list) or not all(
+            row_ok(row, len(columns)) for row in rows
+        ):
+            raise SnapshotError(f"Snapshot has malformed {table} rows")
+    return snapshot
+
+
+def number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Rows are bound as they are, anything sqlite cannot store is rejected here
+def row_ok(row, length):
+    return (
+        isinstance(row, list)
+        and len(row) == length
+        and all(isinstance(v, (int, float, str, type(None))) for v in row)
+    )
+
+
+# With a base snapshot only rows that are new or changed since it are kept
+def export(db, path, base=None):
+    snapshot = {
+        "version": VERSION,
+        "created": time.time(),
+        "base": None,
+        **db.catalog_dump(),
+    }
+    if base is not None:
+        old = load(base)
+        snapshot["base"] = old["created"]
+        for table in CATALOG:
+            known = set(map(tuple, old[table]))
+            snapshot[table] = [
+                row for row in snapshot[table] if tuple(row) not in known
+            ]
+    with open(path, "wb") as f:
+        f.write(zlib.compress(msgpack.packb(snapshot), 9))
+    return {table: len(snapshot[table]) for table in CATALOG}
+
+
+def apply(db, path):
+    snapshot = load(path)
+    applied = db.meta_get("snapshot", 0)
+    if snapshot["base"] is not None and applied < snapshot["base"]:
+        raise SnapshotError(
+            "Delta snapshot needs its base snapshot to be imported first"
+        )
+    if snapshot["created"] <= applied:
+        return {table: 0 for table in CATALOG}
+    db.catalog_load(snapshot)
+    db.meta_set("snapshot", snapshot["created"])
+    return {table: len(snapshot[table]) for table in CATALOG}
@@ -0,0 +1,63 @@
+from dataclasses import dataclass, fields
+
+
+@dataclass
+class ActiveState:
+    active: bool = False
+    id: int | None = None
+    name: str | None = None
+    ip: str | None = None
+    os: str | None = None
+    difficulty: str | None = None
+    user_own: bool = False
+    root_own: bool = False
+    vpn_id: int | None = None
+    vpn_name: str | None = None
+    vpn_ip: str | None = None
+    vpn_address: str | None = None
+    spawn_started: float | None = None
+
+
+class Store:
+    def __init__(self):
+        self.state = ActiveState()
+        self.subscribers = {f.name: [] for f in fields(ActiveState)}
+
+    def subscribe(self, field, callback):
+        self.subscribers[field].append(callback)
+        callback(getattr(self.state, field))
+
+    def unsubscribe(self, field, callback):
+        self.subscribers[field].remove(callback)
+
+    def update(self, **changes):
+        changed = [
+            field
+            for field, value in changes.items()
+            if getattr(self.state, field) != value
+        ]
+        # Apply every change before notifying, callbacks may read siblings
+        for field in changed:
+            setattr(self.state, field, changes[field])
+        for field in changed:
+            for callback in self.subscribers[field]:
+                callback(changes[field])
+        return changed
+
+    def load(self, info):
+        box = info["current_box"] or {}
+        vpn = info["current_vpn"]
+        return self.update(
+            active=bool(box),
+            id=box.get("id"),
+            name=box.get("name"),
+            ip=box.get("ip"),
+            os=box.get("os"),
+            difficulty=box.get("difficulty"),
+            user_own=bool(box.get("user_own")),
+            root_own=bool(box.get("root_own")),
+            vpn_id=vpn.get("id"),
+            vpn_name=vpn.get("name"),
+            vpn_ip=vpn.get("ip"),
+            vpn_address=vpn.get("address"),
+        )
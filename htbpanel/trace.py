@@ -0,0 +1,146 @@
+import asyncio
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import defaultdict
+
+REPORT = "htbpanel_trace.txt"
+HANDLERS = ("on_", "action_", "key_", "machine_action", "submit_flag")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, round(pct / 100 * len(ordered)) - 1)]
+
+
+class Tracer:
+    def __init__(self, threshold=0.1):
+        self.threshold = threshold
+        self.timings = defaultdict(list)
+        self.stalls = []
+        self.beat = time.perf_counter()
+        self.context = None
+        self.loop_thread = threading.get_ident()
+        self.stopped = threading.Event()
+
+    def wrap(self, name, func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.timings[name].append(time.perf_counter() - start)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.timings[name].append(time.perf_counter() - start)
+
+        return wrapper
+
+    def instrument_module(self, module, prefix):
+        for name, func in list(vars(module).items()):
+            if (
+                not name.startswith("_")
+                and inspect.iscoroutinefunction(func)
+                and func.__module__ == module.__name__
+            ):
+                setattr(module, name, self.wrap(f"{prefix}.{name}", func))
+
+    def instrument_class(self, cls, prefixes=None):
+        for name, func in list(vars(cls).items()):
+            if not inspect.isfunction(func) or name.startswith("__"):
+                continue
+            if prefixes is None or name.startswith(prefixes):
+                setattr(cls, name, self.wrap(f"{cls.__name__}.{name}", func))
+
+    def start(self):
+        self.heartbeat_task = asyncio.ensure_future(self.heartbeat())
+        threading.Thread(target=self.watchdog, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        self.heartbeat_task.cancel()
+
+    async def heartbeat(self):
+        interval = self.threshold / 4
+        while True:
+            self.beat = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = time.perf_counter() - self.beat - interval
+            if lag > self.threshold:
+                self.stalls.append((lag, self.context or ["<unknown>"]))
+            self.context = None
+
+    # Runs in its own thread, the loop cannot observe itself while stalled
+    def watchdog(self):
+        while not self.stopped.wait(self.threshold / 2):
+            if (
+                self.context is None
+                and time.perf_counter() - self.beat > self.threshold
+            ):
+                frame = sys._current_frames().get(self.loop_thread)
+                self.context = blame(frame)
+
+    def report(self, path=REPORT):
+        lines = [
+            f"{'hot path':<48} {'calls':>6} {'p50 ms':>9} "
+            f"{'p95 ms':>9} {'max ms':>9}"
+        ]
+        for name, values in sorted(
+            self.timings.items(), key=lambda item: -max(item[1])
+        ):
+            lines.append(
+                f"{name:<48} {len(values):>6} "
+                f"{percentile(values, 50) * 1000:>9.1f} "
+                f"{percentile(values, 95) * 1000:>9.1f} "
+                f"{max(values) * 1000:>9.1f}"
+            )
+        lines.append("")
+        lines.append(
+            f"Event loop stalls over {self.threshold * 1000:.0f} ms: "
+            f"{len(self.stalls)}"
+        )
+        for lag, context in self.stalls:
+            lines.append(f"  {lag * 1000:.1f} ms in {' > '.join(context)}")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+
+# Only wrappers on the stalled stack are to blame, coroutines suspended in an
+# await elsewhere are not running
+def blame(frame):
+    names = []
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == __file__:
+            if code.co_name in ("wrapper", "async_wrapper"):
+                names.append(frame.f_locals["name"])
+        elif "htbpanel" in code.co_filename:
+            stack.append(f"{code.co_filename}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    return names[::-1] + stack[2::-1]
+
+
+def enable(threshold):
+    import htbpanel.htbapi as api
+    import htbpanel.tui as tui
+    from htbpanel.database import Database
+
+    tracer = Tracer(threshold)
+    tracer.instrument_module(api, "htbapi")
+    tracer.instrument_class(Database)
+    tracer.instrument_class(tui.HTBPanel, HANDLERS)
+    return tracer
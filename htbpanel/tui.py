@@ -1,5 +1,7 @@
-import subprocess
+import asyncio
+import time
 
+import httpx
 from textual.app import App
 from textual.containers import (
     Center,
@@ -13,6 +15,7 @@ from textual.widgets import (
     DataTable,
     Footer,
     Input,
+    OptionList,
     RadioButton,
     RadioSet,
     Select,
@@ -22,51 +25,69 @@ from textual.widgets import (
     TabPane,
 )
 from textual.widgets._toggle_button import ToggleButton
+from textual.widgets.option_list import Option
 from textual.widgets.tabbed_content import ContentTabs
 
+import htbpanel.clipboard as clipboard
 import htbpanel.htbapi as api
+import htbpanel.probe as probe
+import htbpanel.ready as ready
+from htbpanel.prefetch import AHEAD, Prefetcher
+from htbpanel.state import Store
 
-ACTIVE = {}
-ACTIVE_VPN = {}
+METRICS_JSON = "htbpanel_metrics.json"
+METRICS_PROM = "htbpanel_metrics.prom"
+# Let the cursor settle before asking the API for a profile
+DETAIL_DELAY = 0.15
 
 
 class Label(Static):
     def __init__(self, title, subtitle="", vpn=False):
         self.BORDER_TITLE = title
         self.BORDER_SUBTITLE = subtitle
-        data = ACTIVE
-        if vpn:
-            data = ACTIVE_VPN
-        active = title.lower() in data
-        classes = "" if active else "unknown-container"
+        self.field = f"vpn_{title.lower()}" if vpn else title.lower()
         super().__init__(
-            content=data[title.lower()] if active else "?",
-            classes=classes,
+            content="?",
+            classes="unknown-container",
             id=title.lower() if not vpn else f"{title.lower()}_vpn",
         )
 
+    def on_mount(self):
+        self.app.store.subscribe(self.field, self.render_value)
+
+    def render_value(self, value):
+        self.set_class(value is None, "unknown-container")
+        self.update("?" if value is None else str(value))
+
 
 class FlagStatus(ToggleButton):
     BUTTON_LEFT = ""
     BUTTON_RIGHT = ""
+    BUTTON_INNER = "?"
 
     def __init__(self, flag_type):
+        self.flag_type = flag_type
         super().__init__(
             id=flag_type,
-            value=self.update_icon(flag_type),
             label=flag_type.capitalize(),
             disabled=True,
             button_first=False,
-            classes="" if ACTIVE else "unknown-container-button",
+            classes="unknown-container-button",
         )
 
-    def update_icon(self, flag_type):
+    def on_mount(self):
+        self.app.store.subscribe("active", self.render_value)
+        self.app.store.subscribe(f"{self.flag_type}_own", self.render_value)
+
+    def render_value(self, _):
+        state = self.app.store.state
+        owned = state.active and getattr(state, f"{self.flag_type}_own")
         self.BUTTON_INNER = "?"
-        owned = False
-        if ACTIVE:
-            owned = ACTIVE[f"{flag_type}_own"]
+        if state.active:
             self.BUTTON_INNER = "✓" if owned else "X"
-        return owned
+        self.set_class(not state.active, "unknown-container-button")
+        self.value = owned
+        self.refresh()
 
 
 class FlagInput(Input):
@@ -76,27 +97,28 @@ class FlagInput(Input):
             id=name,
             restrict=r"[a-zA-Z0-9]*",
             max_length=32,
-            disabled=not ACTIVE,
+            disabled=True,
         )
 
+    def on_mount(self):
+        self.app.store.subscribe("active", self.render_value)
+
+    def render_value(self, active):
+        self.disabled = not active
+
 
 class ButtonAction(Button):
     def __init__(self, name):
         icon = "⏵"
         variant = "success"
         classes = "action-button"
-        disabled = False
         match name:
-            case "start":
-                classes = f"{classes} {'invisible' if ACTIVE else ''}"
             case "stop":
                 icon = "■"
                 variant = "error"
-                classes = f"{classes} {'' if ACTIVE else 'invisible'}"
             case "reset":
                 icon = "↻"
                 variant = "warning"
-                disabled = not ACTIVE
             case "download":
                 icon = "⤓"
                 classes = f"{classes} vpn-action"
@@ -108,10 +130,185 @@ class ButtonAction(Button):
             icon,
             id=name,
             variant=variant,
-            disabled=disabled,
             classes=classes,
         )
 
+    def on_mount(self):
+        if self.id in ["start", "stop", "reset"]:
+            self.app.store.subscribe("active", self.render_value)
+            self.app.store.subscribe("spawn_started", self.render_value)
+
+    # A tracked spawn must finish before the box can be spawned again
+    def render_value(self, _):
+        state = self.app.store.state
+        spawning = state.spawn_started is not None
+        match self.id:
+            case "start":
+                self.set_class(state.active, "invisible")
+                self.disabled = spawning
+            case "stop":
+                self.set_class(not state.active, "invisible")
+                self.disabled = False
+            case "reset":
+                self.disabled = not state.active or spawning
+
+
+class SpawnStatus(Static):
+    def __init__(self):
+        super().__init__(id="spawn", classes="invisible")
+        self.timer = None
+
+    def on_mount(self):
+        self.app.store.subscribe("spawn_started", self.render_value)
+
+    def render_value(self, started):
+        self.set_class(started is None, "invisible")
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+        if started is not None:
+            self.tick()
+            self.timer = self.set_interval(1, self.tick)
+
+    def tick(self):
+        started = self.app.store.state.spawn_started
+        self.update(f"Spawning... {time.monotonic() - started:.0f} s")
+
+
+class MachinePicker(Container):
+    LIMIT = 8
+
+    def __init__(self, id):
+        super().__init__(id=id)
+        self.value = None
+
+    def compose(self):
+        yield Input(placeholder="Machine", id="machine-query")
+        yield OptionList(id="machine-options", classes="invisible")
+
+    def on_mount(self):
+        self.query_input = self.query_one("#machine-query")
+        self.options = self.query_one("#machine-options")
+        self.app.store.subscribe("id", self.render_value)
+
+    def render_value(self, machine_id):
+        if machine_id is not None:
+            self.select(machine_id, self.app.store.state.name)
+        self.disabled = machine_id is not None
+
+    def select(self, machine_id, name):
+        self.value = machine_id
+        with self.query_input.prevent(Input.Changed):
+            self.query_input.value = name
+        self.options.add_class("invisible")
+
+    def suggest(self, query):
+        self.options.clear_options()
+        self.options.add_options(
+            [
+                Option(name, id=str(machine_id))
+                for name, machine_id in self.app.db.machines_by_prefix(
+                    query, self.app.info["user"]["vip"], self.LIMIT
+                )
+            ]
+        )
+        self.options.highlighted = 0 if self.options.option_count else None
+        self.options.set_class(not self.options.option_count, "invisible")
+
+    def on_input_changed(self, event):
+        event.stop()
+        self.value = None
+        self.suggest(event.value)
+
+    def on_input_submitted(self, event):
+        event.stop()
+        if self.options.highlighted is not None:
+            option = self.options.get_option_at_index(self.options.highlighted)
+            self.select(int(option.id), option.prompt)
+
+    def on_option_list_option_selected(self, event):
+        event.stop()
+        self.select(int(event.option.id), event.option.prompt)
+
+
+def vpn_options(rows):
+    return [
+        (name if latency is None else f"{name} ({latency * 1000:.0f} ms)", vpn)
+        for name, vpn, latency in rows
+    ]
+
+
+class VpnSelect(Select):
+    def on_mount(self):
+        self.app.store.subscribe("vpn_id", self.render_value)
+
+    def render_value(self, vpn_id):
+        if vpn_id is not None:
+            self.value = vpn_id
+
+    def render_options(self, rows):
+        value = self.value
+        self.set_options(vpn_options(rows))
+        self.value = value
+
+
+class StatsTable(DataTable):
+    DIMENSIONS = [
+        ("Difficulty", "difficulty"),
+        ("OS", "os"),
+        ("Category", "category"),
+    ]
+
+    def on_mount(self):
+        self.cursor_type = "row"
+        self.add_columns("Group", "Name", "User", "Root", "Total", "Done")
+        self.app.store.subscribe("user_own", self.render_value)
+        self.app.store.subscribe("root_own", self.render_value)
+
+    # Stats are kept up to date by the database, re-reading them is cheap
+    def render_value(self, _):
+        self.clear()
+        for label, dimension in self.DIMENSIONS:
+            self.add_rows(
+                (
+                    label,
+                    key,
+                    user_own,
+                    root_own,
+                    total,
+                    f"{root_own / total:.0%}",
+                )
+                for key, user_own, root_own, total in self.app.db.stats(
+                    dimension
+                )
+            )
+
+
+class MachineDetail(Static):
+    def __init__(self, id):
+        super().__init__("", id=id, classes="border")
+        self.BORDER_TITLE = "Details"
+
+    def render_info(self, info):
+        release = info.get("release") or "?"
+        difficulty = info.get("difficultyText", "?")
+        maker = info.get("maker") or {}
+        self.update(
+            "\n".join(
+                [
+                    f"[b]{info['name']}[/b]",
+                    f"{info.get('os', '?')} · {difficulty}",
+                    f"IP: {info.get('ip') or 'not spawned'}",
+                    f"Free: {'✓' if info.get('free') else 'X'}",
+                    f"Rating: {info.get('stars', '?')} ★",
+                    f"Released: {release[:10]}",
+                    f"Maker: {maker.get('name', '?')}",
+                    f"User owns: {info.get('user_owns_count', '?')}",
+                    f"Root owns: {info.get('root_owns_count', '?')}",
+                ]
+            )
+        )
+
 
 class FilterScreen(ModalScreen):
     BINDINGS = [("q", "cancel", "Cancel")]
@@ -234,6 +431,9 @@ class HTBPanel(App):
         ("1", "active", "Active"),
         ("2", "machines", "Machines"),
         ("3", "vpns", "VPN"),
+        ("4", "api", "API"),
+        ("5", "stats", "Stats"),
+        ("m", "metrics", "Dump metrics"),
         ("ctrl+f", "filters", "Filters"),
         ("Esc", "escape", "Exit field"),
         ("Enter", "submit", "Submit"),
@@ -246,13 +446,13 @@ class HTBPanel(App):
         self.client = client
         self.db = db
         self.info = info
-        self.mounted = False
+        self.store = Store()
+        self.prefetcher = Prefetcher(client)
         self.prepare_data()
 
     def prepare_data(self):
-        self.update_active()
-        self.vpn_types = self.db.vpn_list()
-        self.machine_types = self.db.machines_by_vip(self.info["user"]["vip"])
+        self.store.load(self.info)
+        self.vpn_types = vpn_options(self.db.vpn_list())
 
     def compose(self):
         with TabbedContent(classes="border", id="tab-container"):
@@ -280,15 +480,8 @@ class HTBPanel(App):
                     yield ButtonAction("start")
                     yield ButtonAction("stop")
                     yield ButtonAction("reset")
-                    yield Select(
-                        self.machine_types,
-                        value=self.machine_types[0][1]
-                        if not ACTIVE
-                        else ACTIVE["id"],
-                        disabled=bool(ACTIVE),
-                        id="machine",
-                        allow_blank=False,
-                    )
+                    yield MachinePicker(id="machine")
+                    yield SpawnStatus()
             with TabPane(
                 "Machines", id="pane-machines", classes="border-no-bottom"
             ):
@@ -297,8 +490,9 @@ class HTBPanel(App):
                     yield Button(
                         "Filters", variant="primary", id="filters-button"
                     )
-                with Container():
-                    yield DataTable()
+                with Container(classes="machines-container"):
+                    yield DataTable(id="machines-table")
+                    yield MachineDetail(id="machine-detail")
             with TabPane("VPN", id="pane-vpns", classes="border-no-bottom"):
                 with Container(classes="border-no-top"):
                     with Container(classes="vpn-container"):
@@ -308,20 +502,25 @@ class HTBPanel(App):
                             yield Label("Address", "Copy", vpn=True)
 
                         with Horizontal():
-                            yield Select(
+                            yield VpnSelect(
                                 self.vpn_types,
-                                value=self.vpn_types[0][1]
-                                if not ACTIVE_VPN
-                                else ACTIVE_VPN["id"],
+                                value=self.vpn_types[0][1],
                                 id="vpn",
                                 allow_blank=False,
                             )
                             yield ButtonAction("switch")
                             # yield ButtonAction("download")
+            with TabPane("API", id="pane-api", classes="border-no-bottom"):
+                with Container(classes="border-no-top"):
+                    yield Static(id="api-waits", classes="static-text")
+                    yield DataTable(id="api-table")
+            with TabPane("Stats", id="pane-stats", classes="border-no-bottom"):
+                with Container(classes="border-no-top"):
+                    yield StatsTable(id="stats-table")
         yield Footer()
 
     def on_mount(self):
-        table = self.query_one(DataTable)
+        table = self.query_one("#machines-table")
         table.cursor_type = "row"
         table.add_columns("Name", "Difficulty", "OS", "Free", "Own", "Tags")
         table.add_rows(self.db.machines_with_tags())
@@ -343,8 +542,25 @@ class HTBPanel(App):
         filter_screen.area_types = self.db.tags_area_list()
         filter_screen.vulnerability_types = self.db.tags_vulnerability_list()
         self.install_screen(filter_screen, name="filters")
-        self.update_active()
-        self.mounted = True
+        # Detect the clipboard backend once, off the click path
+        clipboard.backend()
+        self.api_table = self.query_one("#api-table")
+        self.api_table.add_columns(
+            "Endpoint",
+            "Requests",
+            "Status",
+            "Sent KiB",
+            "Recv KiB",
+            "Mean ms",
+            "Max ms",
+        )
+        self.api_waits = self.query_one("#api-waits")
+        self.machine_detail = self.query_one("#machine-detail")
+        if not self.db.vpn_endpoints():
+            self.notify(probe.NO_HOSTNAMES, severity="warning")
+        elif probe.stale(self.db):
+            self.run_worker(self.probe_vpns())
+        self.set_interval(2, self.update_metrics)
 
     def key_ctrl_c(self):
         self.app.exit()
@@ -354,23 +570,24 @@ class HTBPanel(App):
             self.push_screen("filters", self.on_filters_accept)
         elif event.button.id in ["start", "stop", "reset"]:
             machine_select = self.query_one("#machine")
-            ok, message = await api.machine_action(
-                self.client, event.button.id, machine_select.value
+            if machine_select.value is None:
+                self.notify("Select a machine first", severity="error")
+                return
+            self.run_worker(
+                self.machine_action(event.button.id, machine_select.value)
             )
-            if ok:
-                self.notify(message)
-                await self.action_reload()
-            else:
-                self.notify(message, severity="error")
         elif event.button.id in ["switch", "download"]:
             vpn_select = self.query_one("#vpn")
             switched = await api.switch_vpn(
                 self.client, self.info, vpn_select.value
             )
             filename = await api.download_vpn(
-                self.client, self.info, vpn_select.value
+                self.client, self.db, self.info, vpn_select.value
             )
-            self.notify(f"Stored file as {filename}")
+            if filename is None:
+                self.notify("Could not download the VPN file", severity="error")
+            else:
+                self.notify(f"Stored file as {filename}")
             if switched:
                 await self.action_reload()
 
@@ -398,6 +615,14 @@ class HTBPanel(App):
                 ]:
                     return False
                 return True
+            elif self.tab == "pane-api":
+                if action in ["escape", "submit", "api", "filters"]:
+                    return False
+                return True
+            elif self.tab == "pane-stats":
+                if action in ["escape", "submit", "stats", "filters"]:
+                    return False
+                return True
         return False
 
     def action_flag(self):
@@ -424,6 +649,30 @@ class HTBPanel(App):
         self.tab = "pane-vpns"
         self.set_focus(self.query_one(ContentTabs))
 
+    def action_api(self):
+        self.query_one("#tab-container").active = "pane-api"
+        self.tab = "pane-api"
+        self.set_focus(self.query_one(ContentTabs))
+
+    def action_stats(self):
+        self.query_one("#tab-container").active = "pane-stats"
+        self.tab = "pane-stats"
+        self.set_focus(self.query_one(ContentTabs))
+
+    def action_metrics(self):
+        metrics = self.client.metrics
+        for path in [METRICS_JSON, METRICS_PROM]:
+            metrics.dump(path)
+        self.notify(f"Stored metrics as {METRICS_JSON} and {METRICS_PROM}")
+
+    def update_metrics(self):
+        if self.tab != "pane-api":
+            return
+        waits, seconds, rows = self.client.metrics.snapshot()
+        self.api_waits.update(f"Rate limit waits: {waits} ({seconds:.1f} s)")
+        self.api_table.clear()
+        self.api_table.add_rows(rows)
+
     def action_show_tab(self, tab):
         self.query_one("#tab-container").active = tab
         self.tab = tab
@@ -433,40 +682,119 @@ class HTBPanel(App):
 
     def on_click(self, event):
         if event.widget.id in ["ip", "ip_vpn", "address_vpn"]:
-            if not subprocess.call(
-                ["which", "xclip"], stdout=subprocess.DEVNULL
-            ):
-                xclip = subprocess.Popen(
-                    ["xclip", "-sel", "cl"], stdin=subprocess.PIPE
+            value = getattr(self.store.state, event.widget.field)
+            if value is not None:
+                self.run_worker(
+                    clipboard.copy(value, self.copy_to_clipboard)
                 )
-                xclip.communicate(event.widget.renderable.encode())
+
+    async def probe_vpns(self):
+        await probe.update(self.db)
+        self.query_one("#vpn").render_options(self.db.vpn_list())
+
+    def on_data_table_row_highlighted(self, event):
+        table = event.data_table
+        if table.id != "machines-table" or event.cursor_row < 0:
+            return
+        names = [
+            table.get_row_at(row)[0]
+            for row in range(
+                max(0, event.cursor_row - AHEAD),
+                min(table.row_count, event.cursor_row + AHEAD + 1),
+            )
+        ]
+        name = table.get_row_at(event.cursor_row)[0]
+        info = self.prefetcher.cached(name)
+        if info is not None:
+            self.machine_detail.render_info(info)
+        else:
+            self.machine_detail.update(f"Loading {name}...")
+        self.run_worker(
+            self.show_detail(name, names, info is None),
+            group="detail",
+            exclusive=True,
+        )
+
+    async def show_detail(self, name, names, render):
+        await asyncio.sleep(DETAIL_DELAY)
+        try:
+            info = await self.prefetcher.get(name, names)
+        # RuntimeError covers DaemonError without importing msgpack here
+        except (httpx.HTTPError, KeyError, ValueError, RuntimeError):
+            self.machine_detail.update(f"Could not load {name}")
+            return
+        if render:
+            self.machine_detail.render_info(info)
+
+    async def machine_action(self, action, machine_id):
+        buttons = [self.query_one(f"#{b}") for b in ["start", "stop", "reset"]]
+        # Keep controls disabled until the request resolves
+        for btn in buttons:
+            btn.disabled = True
+        try:
+            ok, message = await api.machine_action(
+                self.client, action, machine_id
+            )
+        except BaseException:
+            for btn in buttons:
+                btn.render_value(None)
+            raise
+        if ok and action != "stop":
+            self.store.update(spawn_started=time.monotonic())
+        for btn in buttons:
+            btn.render_value(None)
+        if not ok:
+            self.notify(message, severity="error")
+            return
+        self.notify(message)
+        if action == "stop":
+            await self.action_reload()
+            return
+        try:
+            box = await ready.wait_ready(
+                self.client,
+                db=self.db,
+                vpn_id=self.store.state.vpn_id,
+                on_poll=self.spawn_progress,
+            )
+        finally:
+            self.store.update(spawn_started=None)
+        self.info["current_box"] = box
+        self.store.load(self.info)
+
+    # Show the box as active from the first poll, before it is up
+    def spawn_progress(self, data):
+        if data is not None:
+            self.store.update(active=True, id=data["id"], name=data["name"])
 
     async def on_input_submitted(self, event):
-        if event.input.id == "flag":
+        if event.input.id == "flag" and event.value:
             machine_select = self.query_one("#machine")
-            data = await api.submit_flag(
-                self.client, machine_select.value, event.value
+            self.run_worker(
+                self.submit_flag(event.input, machine_select.value, event.value)
             )
-            if "Incorrect" in data["message"]:
-                self.notify(data["message"], severity="error")
-            else:
-                own_type = data["own_type"].lower()
-                self.notify(data["message"])
-                self.db.machine_own(
-                    machine_select.value, own_type
-                )
-                flag_btn = self.query_one(f"#{own_type}")
-                ACTIVE[f"{own_type}_own"] = True
-                flag_btn.value = flag_btn.update_icon(own_type)
-                flag_btn.refresh()
-                event.input.clear()
+
+    async def submit_flag(self, flag_in, machine_id, flag):
+        flag_in.disabled = True
+        try:
+            data = await api.submit_flag(self.client, machine_id, flag)
+        finally:
+            flag_in.disabled = not self.store.state.active
+        if "Incorrect" in data["message"]:
+            self.notify(data["message"], severity="error")
+        else:
+            own_type = data["own_type"].lower()
+            self.notify(data["message"])
+            self.db.machine_own(machine_id, own_type)
+            self.store.update(**{f"{own_type}_own": True})
+            flag_in.clear()
 
     async def on_input_changed(self, event):
         if event.input.id == "search":
             await self._debounced_search(event.value)
 
     async def _debounced_search(self, query):
-        table = self.query_one(DataTable)
+        table = self.query_one("#machines-table")
         table.clear()
         table.add_rows(self.db.machines_by_name(query))
 
@@ -478,96 +806,11 @@ class HTBPanel(App):
 
     def on_filters_accept(self, data):
         if data:
-            table = self.query_one(DataTable)
+            table = self.query_one("#machines-table")
             table.clear()
             table.add_rows(self.db.machines_by_filters(data))
 
     async def action_reload(self):
         self.info.update(await api.query_current_box(self.client))
         self.info.update(await api.query_current_vpn(self.client))
-        self.update_active()
-
-    def update_active(self):
-        active = self.info["current_box"] is not None
-        active_vpn = "ip" in self.info["current_vpn"]
-        if active:
-            ACTIVE.update(self.info["current_box"])
-        else:
-            ACTIVE.clear()
-        ACTIVE_VPN.clear()
-        ACTIVE_VPN.update(self.info["current_vpn"])
-        if self.mounted:
-            if active:
-                # Show stop
-                stop_btn = self.query_one("#stop")
-                stop_btn.remove_class("invisible")
-                # Hide start
-                start_btn = self.query_one("#start")
-                start_btn.add_class("invisible")
-                # Update reset disabled status
-                reset_btn = self.query_one("#reset")
-                reset_btn.disabled = False
-                # Update user/root flag status and color
-                for flag_type in ["user", "root"]:
-                    flag_btn = self.query_one(f"#{flag_type}")
-                    flag_btn.remove_class("unknown-container-button")
-                    flag_btn.value = flag_btn.update_icon(flag_type)
-                    flag_btn.refresh()
-                # Enable flag input
-                flag_in = self.query_one("#flag")
-                flag_in.disabled = False
-                # Update box information
-                for box_type in ["name", "ip", "os", "difficulty"]:
-                    box_label = self.query_one(f"#{box_type}")
-                    box_label.remove_class("unknown-container")
-                    box_label.update(ACTIVE[box_type])
-                # Set machine select to current box and disable
-                machine_sel = self.query_one("#machine")
-                machine_sel.value = ACTIVE["id"]
-                machine_sel.disabled = True
-            else:
-                # Hide stop
-                stop_btn = self.query_one("#stop")
-                stop_btn.add_class("invisible")
-                # Show start
-                start_btn = self.query_one("#start")
-                start_btn.remove_class("invisible")
-                # Update reset disabled status
-                reset_btn = self.query_one("#reset")
-                reset_btn.disabled = True
-                # Update user/root flag status and color
-                for flag_type in ["user", "root"]:
-                    flag_btn = self.query_one(f"#{flag_type}")
-                    flag_btn.add_class("unknown-container-button")
-                    flag_btn.value = flag_btn.update_icon(flag_type)
-                    flag_btn.refresh()
-                # Disable flag input
-                flag_in = self.query_one("#flag")
-                flag_in.disabled = True
-                # Remove box information
-                for box_type in ["name", "ip", "os", "difficulty"]:
-                    box_label = self.query_one(f"#{box_type}")
-                    box_label.add_class("unknown-container")
-                    box_label.update("?")
-                # Eanble machine select
-                machine_sel = self.query_one("#machine")
-                machine_sel.disabled = False
-            if active_vpn:
-                # Update vpn information
-                for vpn_type in ["ip", "address"]:
-                    vpn_label = self.query_one(f"#{vpn_type}_vpn")
-                    vpn_label.remove_class("unknown-container")
-                    if vpn_type in ACTIVE_VPN:
-                        vpn_label.update(ACTIVE_VPN[vpn_type])
-                # Set vpn select to current vpn
-                vpn_sel = self.query_one("#vpn")
-                vpn_sel.value = ACTIVE_VPN["id"]
-            else:
-                # Remove box information
-                for vpn_type in ["ip", "address"]:
-                    vpn_label = self.query_one(f"#{vpn_type}_vpn")
-                    vpn_label.add_class("unknown-container")
-                    vpn_label.update("?")
-            # Update vpn information in any case
-            vpn_name = self.query_one("#name_vpn")
-            vpn_name.update(ACTIVE_VPN["name"])
+        self.store.load(self.info)